@@ -121,3 +121,24 @@ fig3.savefig(overall_metrics_path, facecolor="#212121")
 plt.close(fig3)
 
 print("Plots saved as: 'confusion_matrices.png', 'class_metrics.png', 'overall_metrics.png'")
+
+# Plot 4: Throughput vs Latency (written by `src/benchmark_models.py --sweep`)
+sweep_path = "./logs/throughput_sweep.csv"
+if os.path.exists(sweep_path):
+    import pandas as pd
+
+    sweep = pd.read_csv(sweep_path)
+    fig4, ax = plt.subplots(figsize=(10, 6), dpi=100)
+    for (model, threads), curve in sweep.groupby(["model", "threads"]):
+        curve = curve.sort_values("batch_size")
+        ax.plot(curve["latency_p50"] * 1000, curve["throughput"], marker="o", label=f"{model} ({threads} threads)")
+        for _, row in curve.iterrows():
+            ax.annotate(str(row["batch_size"]), (row["latency_p50"] * 1000, row["throughput"]), color="white", fontsize=8)
+    ax.set_xlabel("p50 Latency (ms)", color="white")
+    ax.set_ylabel("Throughput (images/s)", color="white")
+    ax.legend()
+    ax.set_facecolor("#212121")
+    fig4.patch.set_facecolor("#212121")
+    fig4.savefig(os.path.join(save_dir, "throughput_vs_latency.png"), facecolor="#212121")
+    plt.close(fig4)
+    print("Plot saved as: 'throughput_vs_latency.png'")
@@ -1,53 +1,91 @@
 import torch
-from torchvision import datasets, transforms, models
 from pytorch_lightning import LightningModule, Trainer
 from pytorch_lightning.loggers import CSVLogger
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix, classification_report
 import os
-import time
-import numpy as np
-from transformers import AutoModelForImageClassification
+import re
+import csv
+import io
+import copy
+import json
+import argparse
+from evaluation import StreamingClassificationMetrics
+from timing import measure_latency
+from layer_profiler import profile_layers, write_rows
+from compile_utils import CompiledForward
+from precision import PRECISIONS, lightning_precision, autocast_context, cast_model, cast_input
+from checkpoint_registry import build_index, select_checkpoints
+from logit_cache import CACHE_DIR, logit_cache_dir, read_logit_cache, LogitCacheWriter
+from models.engine import BACKBONES, get_backbone
+from dataset.batch_transforms import BatchResizeNormalize
+from dataset.cifar10_store import PackedCIFAR10
 
 
 class BenchmarkModel(LightningModule):
-    def __init__(self, model, test_loader, model_name):
+    def __init__(self, model, test_loader, model_name, map_bins=10000, input_transform=None, image_size=224,
+                 precision="fp32", compile=False):
         super().__init__()
         self.model = model
         self.test_loader = test_loader
         self.model_name = model_name
         self.results = {}
-        self.all_outputs = []  # Use this to collect outputs
 
-    def test_step(self, batch, batch_idx):
+        # Per-model resize/normalize applied on-device, so one raw test loader serves every model
+        self.input_transform = input_transform
+        self.image_size = image_size
+
+        # Numeric precision for every forward pass (fp32, bf16-mixed or bf16-true)
+        self.precision_mode = precision
+        self.model = cast_model(self.model, precision)
+
+        # Optional torch.compile'd forward, timed separately from steady-state latency
+        self.compiled_forward = CompiledForward(self.model) if compile else None
+
+        # Confusion matrix, top-k counters and AP histograms; no per-sample outputs are kept,
+        # so memory does not grow with the test set (map_bins sets the AP score resolution; None keeps
+        # every score for the exact AP)
+        self.evaluator = StreamingClassificationMetrics(10, top_k=(1, 5), num_bins=map_bins)
+
+        # Optional LogitCacheWriter that receives every test batch's logits
+        self.logit_writer = None
+
+    def predict_logits(self, x):
+        """Forward pass in the configured precision, always returning fp32 logits."""
+        forward = self.compiled_forward if self.compiled_forward is not None else self.model
+        with autocast_context(self.precision_mode, x.device):
+            return forward(cast_input(x, self.precision_mode)).float()
+
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        if self.input_transform is None:
+            return batch
         images, labels = batch
-        outputs = self.model(images)
-        preds = torch.argmax(outputs, dim=1)
-        probabilities = torch.softmax(outputs, dim=1)  # Get predicted probabilities for mAP
+        return self.input_transform(images), labels
 
-        # Collect outputs
-        self.all_outputs.append({"preds": preds.cpu(), "labels": labels.cpu(), "probs": probabilities.cpu()})
+    def on_test_epoch_start(self):
+        self.evaluator.reset()
 
-        return {"preds": preds.cpu(), "labels": labels.cpu(), "probs": probabilities.cpu()}
+    def test_step(self, batch, batch_idx):
+        images, labels = batch
+        with torch.inference_mode():
+            outputs = self.predict_logits(images)
+
+        logits, labels = outputs.cpu().numpy(), labels.cpu().numpy()
+        self.evaluator.update(logits, labels)
+        if self.logit_writer is not None:
+            self.logit_writer.write(logits, labels)
 
     def on_test_epoch_end(self):
-        # Combine all outputs
-        all_preds = torch.cat([x["preds"] for x in self.all_outputs], dim=0)
-        all_labels = torch.cat([x["labels"] for x in self.all_outputs], dim=0)
-        all_probs = torch.cat([x["probs"] for x in self.all_outputs], dim=0)
-
-        # Calculate metrics
-        accuracy = accuracy_score(all_labels, all_preds)
-        top5_accuracy = (all_labels.unsqueeze(1) == torch.topk(all_probs, k=5, dim=1)[1]).sum().item() / len(all_labels)
-        precision = precision_score(all_labels, all_preds, average="weighted")
-        recall = recall_score(all_labels, all_preds, average="weighted")
-        f1 = f1_score(all_labels, all_preds, average="weighted")
-        conf_matrix = confusion_matrix(all_labels, all_preds)
+        # Every metric comes from the evaluator's accumulated statistics
+        metrics = self.evaluator.compute()
+        accuracy = metrics["accuracy"]
+        top5_accuracy = metrics["top5_accuracy"]
+        precision = metrics["precision"]
+        recall = metrics["recall"]
+        f1 = metrics["f1_score"]
+        conf_matrix = metrics["confusion_matrix"]
+        map_score = metrics["mAP"]
 
         # Class-wise metrics
-        class_report = classification_report(all_labels, all_preds, target_names=[f"Class {i}" for i in range(10)])
-
-        # Calculate mAP
-        map_score = self.calculate_map(all_probs.numpy(), all_labels.numpy(), num_classes=10)
+        class_report = self.evaluator.classification_report(target_names=[f"Class {i}" for i in range(10)])
 
         # Store results
         self.results = {
@@ -73,156 +111,285 @@ class BenchmarkModel(LightningModule):
         print(f"Confusion Matrix:\n{conf_matrix}")
         print(f"Class-Wise Metrics:\n{class_report}")
 
-    def calculate_map(self, probs, labels, num_classes):
-        """
-        Calculate Mean Average Precision (mAP) for single-label classification.
-        :param probs: Predicted probabilities (N x C array).
-        :param labels: True labels (N array).
-        :param num_classes: Number of classes.
-        :return: Mean Average Precision (mAP).
-        """
-        aps = []
-        for c in range(num_classes):
-            # Get true binary labels and predicted probabilities for class c
-            true_labels = (labels == c).astype(int)
-            predicted_probs = probs[:, c]
-
-            # Sort by predicted probability
-            sorted_indices = np.argsort(-predicted_probs)
-            true_labels = true_labels[sorted_indices]
-            predicted_probs = predicted_probs[sorted_indices]
-
-            # Calculate precision-recall curve
-            tp = np.cumsum(true_labels)
-            fp = np.cumsum(1 - true_labels)
-            precision = tp / (tp + fp + 1e-7)
-            recall = tp / (np.sum(true_labels) + 1e-7)
-
-            # Calculate AP for this class
-            ap = np.sum(precision[1:] * np.diff(recall))
-            aps.append(ap)
-
-        return np.mean(aps)
-
-    def benchmark_speed(self, device, input_size=None, num_runs=100):
+    def evaluate_logits(self, logits, labels, chunk_size=4096):
+        """Compute every test metric from previously saved logits, without running the model."""
+        # The logits are all on disk already, so AP is computed exactly instead of from histograms
+        streaming = self.evaluator
+        self.evaluator = StreamingClassificationMetrics(10, top_k=(1, 5), num_bins=None)
+        try:
+            for start in range(0, len(labels), chunk_size):
+                self.evaluator.update(logits[start:start + chunk_size], labels[start:start + chunk_size])
+            self.on_test_epoch_end()
+        finally:
+            self.evaluator = streaming
+
+    def benchmark_speed(self, device, input_size=None, num_runs=100, warmup_runs=10):
         """
         Benchmark the latency and throughput of the model.
         :param device: Device to run the benchmark (CPU or GPU).
-        :param input_size: Tuple specifying the input size (default: (1, 3, 224, 224)).
-        :param num_runs: Number of runs for the benchmark.
+        :param input_size: Tuple specifying the input size (default: (1, 3, image_size, image_size)).
+        :param num_runs: Number of timed runs for the benchmark.
+        :param warmup_runs: Number of untimed runs before measuring.
         """
         self.model.eval()
 
         # Determine the input size
         if input_size is None:
-            input_size = (1, 3, 224, 224)
+            input_size = (1, 3, self.image_size, self.image_size)
 
         dummy_input = torch.randn(input_size).to(device)
 
-        # Warm-up runs
-        for _ in range(10):
+        def forward():
             with torch.no_grad():
-                self.model(dummy_input)
+                self.predict_logits(dummy_input)
 
-        # Measure latency
-        start_time = time.time()
-        for _ in range(num_runs):
-            with torch.no_grad():
-                self.model(dummy_input)
-        end_time = time.time()
+        # Each run is timed individually with the device synchronized
+        stats, _ = measure_latency(forward, device, num_runs=num_runs, warmup_runs=warmup_runs)
+        throughput = input_size[0] / stats["mean"]
 
-        avg_latency = (end_time - start_time) / num_runs
-        throughput = 1 / avg_latency
-
-        self.results["latency"] = avg_latency
+        self.results["latency"] = stats["mean"]
         self.results["throughput"] = throughput
+        for key in ("std", "p50", "p90", "p99", "max", "cv"):
+            self.results[f"latency_{key}"] = stats[key]
 
-        print(f"Latency: {avg_latency:.4f}s, Throughput: {throughput:.2f} images/s")
-
-
-# Load CIFAR-10 test dataset
-def load_test_dataset(batch_size=32, num_workers=4):
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),  # Resize images to 224x224
-        transforms.ToTensor(),
-        transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
-    ])
-    test_dataset = datasets.CIFAR10(root='../data', train=False, download=True, transform=transform)
-    test_loader = torch.utils.data.DataLoader(test_dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers, persistent_workers=True)
-    return test_loader
-
-
-# Main benchmarking function
-def main():
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    test_loader = load_test_dataset()
-
-    # Define MobileNetV3 architecture from hugging face
-    class MobilenetModel(torch.nn.Module):
-        def __init__(self, num_classes=10):
-            super().__init__()
-            self.model = AutoModelForImageClassification.from_pretrained(
-                "AiresPucrs/Mobilenet-v2-CIFAR-10",
-                num_labels=num_classes,
-                ignore_mismatched_sizes=True,
-            )
+        print(f"Latency: {stats['mean']:.4f}s (p50 {stats['p50']:.4f}s, p90 {stats['p90']:.4f}s, "
+              f"p99 {stats['p99']:.4f}s, max {stats['max']:.4f}s, std {stats['std']:.4f}s, CV {stats['cv']:.2%}), "
+              f"Throughput: {throughput:.2f} images/s")
 
-        def forward(self, x):
-            return self.model(x).logits  # Extract logits from the Hugging Face model output
+    def profile_layers(self, device, output_dir="./logs/profiles", num_runs=10, warmup_runs=3):
+        """
+        Break the batch-1 forward pass down by module and layer type with torch.profiler.
+        Writes a per-module CSV table and a Chrome trace to `output_dir`, and keeps the per-type summary.
+        :param device: Device to run the profiled forward passes on (CPU time is what gets attributed).
+        :param num_runs: Profiled forward passes; reported numbers are per pass.
+        :param warmup_runs: Unprofiled passes run first.
+        """
+        self.model.eval()
+        dummy_input = torch.randn(1, 3, self.image_size, self.image_size).to(device)
 
-    mobilenet_model = MobilenetModel(num_classes=10)
+        def forward():
+            with torch.no_grad():
+                self.predict_logits(dummy_input)
+
+        os.makedirs(output_dir, exist_ok=True)
+        stem = os.path.join(output_dir, re.sub(r"[^\w.-]+", "_", self.model_name).strip("_"))
+        module_rows, type_rows = profile_layers(forward, self.model, num_runs=num_runs, warmup_runs=warmup_runs,
+                                                trace_path=f"{stem}_trace.json")
+        write_rows(module_rows, f"{stem}_layers.csv")
+        self.results["layer_profile"] = type_rows
+        self.results["layer_profile_table"] = f"{stem}_layers.csv"
+        self.results["layer_profile_trace"] = f"{stem}_trace.json"
+
+        print(f"{'Layer type':<16}{'CPU ms':>10}{'Share':>8}{'MFLOPs':>12}{'Alloc MiB':>12}")
+        for row in type_rows:
+            print(f"{row['layer_type']:<16}{row['cpu_ms']:>10.3f}{row['cpu_share']:>8.1%}"
+                  f"{row['flops'] / 1e6:>12.1f}{row['alloc_bytes'] / 2 ** 20:>12.2f}")
+        print(f"Per-module table: {stem}_layers.csv, Chrome trace: {stem}_trace.json")
+
+    def measure_model_size(self):
+        """Record the serialized size of the model's weights."""
+        buffer = io.BytesIO()
+        torch.save(self.model.state_dict(), buffer)
+        self.results["model_size_mb"] = buffer.getbuffer().nbytes / 2 ** 20
+        print(f"Model Size: {self.results['model_size_mb']:.2f} MB")
+
+    def sweep_throughput(self, device, batch_sizes=(1, 2, 4, 8, 16, 32, 64, 128, 256), thread_counts=None,
+                         image_size=None, num_runs=20, warmup_runs=3):
+        """
+        Measure latency and throughput over a grid of batch sizes and intra-op thread counts.
+        :param device: Device to run the benchmark (CPU or GPU).
+        :param batch_sizes: Batch sizes to sweep.
+        :param thread_counts: Values for torch.set_num_threads (default: current setting only).
+        :param image_size: Square input resolution (default: the model's own).
+        :param num_runs: Number of timed runs per configuration.
+        :param warmup_runs: Number of untimed runs per configuration.
+        :return: List of result rows, one per (threads, batch size).
+        """
+        self.model.eval()
+        image_size = image_size or self.image_size
+        original_threads = torch.get_num_threads()
+        thread_counts = thread_counts or [original_threads]
+        rows = []
+        try:
+            for threads in thread_counts:
+                torch.set_num_threads(threads)
+                for batch_size in batch_sizes:
+                    dummy_input = torch.randn(batch_size, 3, image_size, image_size).to(device)
+
+                    def forward():
+                        with torch.no_grad():
+                            self.predict_logits(dummy_input)
+
+                    stats, _ = measure_latency(forward, device, num_runs=num_runs, warmup_runs=warmup_runs)
+                    rows.append({
+                        "model": self.model_name,
+                        "threads": threads,
+                        "interop_threads": torch.get_num_interop_threads(),
+                        "batch_size": batch_size,
+                        "latency_mean": stats["mean"],
+                        "latency_p50": stats["p50"],
+                        "latency_p99": stats["p99"],
+                        "throughput": batch_size / stats["mean"],
+                    })
+                    print(f"threads={threads:<3} batch={batch_size:<4} p50 {stats['p50'] * 1000:8.2f}ms "
+                          f"p99 {stats['p99'] * 1000:8.2f}ms  {rows[-1]['throughput']:9.2f} images/s")
+        finally:
+            torch.set_num_threads(original_threads)
+
+        self.results["sweep"] = rows
+        self.results["sweep_knee"] = find_knee(rows)
+        knee = self.results["sweep_knee"]
+        print(f"Recommended: threads={knee['threads']}, batch={knee['batch_size']} "
+              f"({knee['throughput']:.2f} images/s at p50 {knee['latency_p50'] * 1000:.2f}ms)")
+        return rows
+
+
+def find_knee(rows, fraction=0.9):
+    """
+    Pick the knee of a throughput-vs-latency curve: on the thread count with the highest peak
+    throughput, the smallest batch size that reaches `fraction` of that peak. Larger batches past
+    this point mostly add latency.
+    """
+    best = max(rows, key=lambda row: row["throughput"])
+    curve = sorted((row for row in rows if row["threads"] == best["threads"]), key=lambda row: row["batch_size"])
+    return next(row for row in curve if row["throughput"] >= fraction * best["throughput"])
+
+
+def save_layer_profiles(benchmarks, csv_path="./logs/layer_profile_summary.csv"):
+    """Write every profiled model's per-type breakdown to one CSV, for comparing where models spend time."""
+    rows = [{"model": benchmark.results["model"], **row}
+            for benchmark in benchmarks for row in benchmark.results.get("layer_profile", [])]
+    if not rows:
+        return
+    write_rows(rows, csv_path)
+    print(f"Layer profile summary saved to: {csv_path}")
+
+
+def save_sweep_results(benchmarks, json_path="./logs/throughput_sweep.json", csv_path="./logs/throughput_sweep.csv"):
+    """Write sweep rows (and each model's recommended knee) as JSON and a flat CSV for the plotters."""
+    rows = [row for benchmark in benchmarks for row in benchmark.results.get("sweep", [])]
+    if not rows:
+        return
+    with open(json_path, "w") as f:
+        json.dump({
+            "rows": rows,
+            "knees": {benchmark.model_name: benchmark.results["sweep_knee"]
+                      for benchmark in benchmarks if "sweep_knee" in benchmark.results},
+        }, f, indent=2)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Throughput sweep saved to: {json_path}, {csv_path}")
+
+
+class LogitsModel(torch.nn.Module):
+    """Wraps a registry backbone so it returns plain logits; state_dict keys match training checkpoints."""
+
+    def __init__(self, backbone, num_classes=10):
+        super().__init__()
+        self.model = get_backbone(backbone)["build"](num_classes)
+        # Decided once here rather than per call, so the forward stays traceable (FX, TorchScript)
+        self.returns_model_output = hasattr(self.model, "config")
 
-    # Define DeiT-T architecture
-    class DeiTModel(torch.nn.Module):
-        def __init__(self, num_classes=10):
-            super().__init__()
-            self.model = AutoModelForImageClassification.from_pretrained(
-                "facebook/deit-tiny-patch16-224",
-                num_labels=num_classes,
-                ignore_mismatched_sizes=True,
-            )
+    def forward(self, x):
+        outputs = self.model(x)
+        return outputs.logits if self.returns_model_output else outputs  # Extract logits from Hugging Face model output
 
-        def forward(self, x):
-            return self.model(x).logits  # Extract logits from Hugging Face model output
 
-    deit_model = DeiTModel(num_classes=10)
+def load_checkpoint_model(entry, device):
+    """Construct the backbone for an index entry and load its trained weights."""
+    model = LogitsModel(entry["backbone"], num_classes=10)
+    checkpoint = torch.load(entry["path"], map_location=device, weights_only=False)
+    model.load_state_dict(checkpoint["state_dict"])
+    return model.to(device)
 
-    # Load state_dict from checkpoint
-    mobilenet_model_path = './saved_models/MobileNetV2CIFAR10_2024-12-01_00-11-05_best.ckpt'
-    deit_model_path = './saved_models/DeiTTinyForClassification_2024-11-27_22-38-14_best.ckpt'
 
-    mobilenet_checkpoint = torch.load(mobilenet_model_path, map_location=device)
-    deit_checkpoint = torch.load(deit_model_path, map_location=device)
+def benchmark_label(entry, entries):
+    """Display name for reports; adds the timestamp when several checkpoints of one model are compared."""
+    display_name = get_backbone(entry["backbone"])["display_name"]
+    if sum(other["model_name"] == entry["model_name"] for other in entries) > 1:
+        return f"{display_name} ({entry['timestamp']})"
+    return display_name
 
-    # Load weights into the models
-    mobilenet_model.load_state_dict(mobilenet_checkpoint["state_dict"])
-    deit_model.load_state_dict(deit_checkpoint["state_dict"])
 
-    # Send models to device
-    mobilenet_model.to(device)
-    deit_model.to(device)
+# Load CIFAR-10 test dataset
+def load_test_dataset(batch_size=32, num_workers=4):
+    # Raw uint8 32x32 images; each model resizes/normalizes on-device via its input transform
+    test_dataset = PackedCIFAR10("test")
+    test_loader = torch.utils.data.DataLoader(test_dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers, persistent_workers=num_workers > 0)
+    return test_loader
 
-    # Initialize CSV Logger
-    logger = CSVLogger(save_dir="./logs", name="benchmark_logs")
 
-    # Benchmark MobileNet
-    print("\nBenchmarking MobileNetV2...")
-    mobilenet_benchmark = BenchmarkModel(mobilenet_model, test_loader, "MobileNetV2")
-    trainer = Trainer(logger=logger, accelerator=device, devices=1, max_epochs=1)
-    trainer.test(mobilenet_benchmark, test_loader)
-    mobilenet_benchmark.benchmark_speed(device)
-
-    # Benchmark DeiT
-    print("\nBenchmarking DeiT...")
-    deit_benchmark = BenchmarkModel(deit_model, test_loader, "DeiT-T")
-    trainer.test(deit_benchmark, test_loader)
-    deit_benchmark.benchmark_speed(device)
-
-    # Save results to a human-readable file
-    results_path = "./logs/extended_benchmark_results.txt"
+def run_test(benchmark, trainer, test_loader, cache_dir=None, cache_key=None):
+    """Evaluate from the logit cache when it holds this configuration, otherwise run the test pass and fill it."""
+    cached = read_logit_cache(cache_dir) if cache_dir else None
+    if cached is not None:
+        print(f"Using cached logits from {cache_dir}")
+        benchmark.evaluate_logits(*cached)
+        return
+    if cache_dir:
+        benchmark.logit_writer = LogitCacheWriter(cache_dir, len(test_loader.dataset), 10, cache_key)
+    trainer.test(benchmark, test_loader)
+    if benchmark.logit_writer is not None:
+        benchmark.logit_writer.finish()
+        benchmark.logit_writer = None
+
+
+def compare_to_reference(results, reference):
+    """Record accuracy delta and speedup of a run against the eager fp32 run of the same checkpoint."""
+    results["accuracy_delta"] = results["accuracy"] - reference["accuracy"]
+    results["mAP_delta"] = results["mAP"] - reference["mAP"]
+    results["speedup"] = reference["latency"] / results["latency"]
+    print(f"vs eager fp32: accuracy {results['accuracy_delta']:+.4f}, mAP {results['mAP_delta']:+.4f}, "
+          f"speedup {results['speedup']:.2f}x")
+
+
+def compare_native_to_base(benchmarks):
+    """
+    Accuracy delta and speedup of each native-resolution run against the run of the base backbone it
+    derives from. The base may itself run at 32px (the MobileNets, where the native variant only
+    reduces strides), so the comparison is labelled with the base's input resolution.
+    With several checkpoints per backbone, the reference is the base checkpoint the native run was
+    initialized from if it was benchmarked, otherwise the newest benchmarked base checkpoint.
+    """
+    runs = {}
+    for b in benchmarks:
+        runs.setdefault((b.results["backbone"], b.results["precision_mode"], b.results["compiled"]), []).append(b.results)
+    for (backbone, precision, compiled), backbone_runs in runs.items():
+        base = get_backbone(backbone).get("base")
+        candidates = runs.get((base, precision, compiled))
+        if not candidates:
+            continue
+        # Checkpoint filenames of one model sort by their timestamp
+        newest = max(candidates, key=lambda reference: reference["checkpoint"])
+        for results in backbone_runs:
+            reference = next((candidate for candidate in candidates
+                              if candidate["checkpoint"] == results.get("init_checkpoint")), newest)
+            results["base_model"] = reference["model"]
+            results["base_checkpoint"] = reference["checkpoint"]
+            results["base_image_size"] = get_backbone(base)["image_size"]
+            results["base_accuracy_delta"] = results["accuracy"] - reference["accuracy"]
+            results["base_speedup"] = reference["latency"] / results["latency"]
+            print(f"{results['model']} vs {reference['model']} ({results['base_image_size']}px input): "
+                  f"accuracy {results['base_accuracy_delta']:+.4f}, speedup {results['base_speedup']:.2f}x")
+
+
+def save_results(benchmarks, results_path="./logs/extended_benchmark_results.txt"):
+    """Save results to a human-readable file."""
     with open(results_path, "w") as f:
-        for result in [mobilenet_benchmark.results, deit_benchmark.results]:
+        for result in [benchmark.results for benchmark in benchmarks]:
             f.write(f"Model: {result['model']}\n")
+            if "checkpoint" in result:
+                f.write(f"Checkpoint: {result['checkpoint']}\n")
+            if "quantization" in result:
+                f.write(f"Quantization: {result['quantization']}\n")
+            if "quantization_gate" in result:
+                f.write(f"Accuracy Gate: {result['quantization_gate']}\n")
+            if "pruning" in result:
+                f.write(f"Pruning: {result['pruning']}\n")
+            if "precision_mode" in result:
+                f.write(f"Numeric Precision: {result['precision_mode']}\n")
             f.write(f"Accuracy: {result['accuracy']:.4f}\n")
             f.write(f"Top-5 Accuracy: {result['top5_accuracy']:.4f}\n")
             f.write(f"Precision: {result['precision']:.4f}\n")
@@ -230,7 +397,32 @@ def main():
             f.write(f"F1 Score: {result['f1_score']:.4f}\n")
             f.write(f"mAP: {result['mAP']:.4f}\n")
             f.write(f"Latency: {result['latency']:.4f}s\n")
+            f.write(f"Latency p50/p90/p99/max: {result['latency_p50']:.4f}s / {result['latency_p90']:.4f}s / "
+                    f"{result['latency_p99']:.4f}s / {result['latency_max']:.4f}s\n")
+            f.write(f"Latency Std Dev: {result['latency_std']:.4f}s (CV {result['latency_cv']:.2%})\n")
             f.write(f"Throughput: {result['throughput']:.2f} images/s\n")
+            if "model_size_mb" in result:
+                f.write(f"Model Size: {result['model_size_mb']:.2f} MB\n")
+            if "compile_time" in result:
+                f.write(f"Compile Time: {result['compile_time']:.2f}s over {result['compilations']} compilation(s), "
+                        f"{result['graph_breaks']} graph break(s)"
+                        f"{' (fell back to eager)' if result['compile_fallback'] else ''}, "
+                        f"Speedup vs Eager: {result['eager_speedup']:.2f}x\n")
+            if "speedup" in result:
+                f.write(f"vs eager fp32: Accuracy {result['accuracy_delta']:+.4f}, mAP {result['mAP_delta']:+.4f}, "
+                        f"Speedup {result['speedup']:.2f}x\n")
+            if "base_speedup" in result:
+                f.write(f"vs {result['base_model']} ({result['base_image_size']}px input, {result['base_checkpoint']}): "
+                        f"Accuracy {result['base_accuracy_delta']:+.4f}, Speedup {result['base_speedup']:.2f}x\n")
+            if "layer_profile" in result:
+                f.write(f"Layer Profile ({result['layer_profile_table']}, trace {result['layer_profile_trace']}):\n")
+                for row in result["layer_profile"]:
+                    f.write(f"  {row['layer_type']:<16} {row['cpu_ms']:8.3f} ms ({row['cpu_share']:6.1%}), "
+                            f"{row['flops'] / 1e6:10.1f} MFLOPs, {row['alloc_bytes'] / 2 ** 20:8.2f} MiB allocated\n")
+            if "sweep_knee" in result:
+                knee = result["sweep_knee"]
+                f.write(f"Recommended Serving Config: batch {knee['batch_size']}, {knee['threads']} threads "
+                        f"({knee['throughput']:.2f} images/s, p50 {knee['latency_p50']:.4f}s)\n")
             f.write(f"Confusion Matrix:\n{result['confusion_matrix']}\n")
             f.write(f"Class-Wise Metrics:\n{result['class_report']}\n")
             f.write("\n")
@@ -238,5 +430,143 @@ def main():
     print(f"\nBenchmark results saved to: {results_path}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark trained checkpoints on the CIFAR-10 test set.")
+    parser.add_argument("--models-dir", default="./saved_models")
+    parser.add_argument("--list", action="store_true", help="Print the checkpoint index and exit")
+    parser.add_argument("--models", nargs="+", default=None,
+                        help=f"Backbones to benchmark, by key or checkpoint prefix (default: all of {list(BACKBONES)})")
+    parser.add_argument("--checkpoints", nargs="+", default=None,
+                        help="Explicit checkpoint filenames in the models dir; overrides --models/--tag")
+    parser.add_argument("--tag", default="best", help="Checkpoint tag to select, e.g. 'best' ('all' for any)")
+    parser.add_argument("--all-versions", action="store_true",
+                        help="Benchmark every matching checkpoint, not only the newest per model")
+    parser.add_argument("--precision", nargs="+", default=["fp32"], choices=list(PRECISIONS),
+                        help="Numeric precisions to benchmark; non-fp32 runs report accuracy delta and speedup vs fp32")
+    parser.add_argument("--compile", action="store_true",
+                        help="Also benchmark a torch.compile'd forward next to each eager run")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Also sweep batch sizes and thread counts for throughput")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64, 128, 256])
+    parser.add_argument("--threads", type=int, nargs="+", default=None,
+                        help="Intra-op thread counts to sweep (default: current setting)")
+    parser.add_argument("--interop-threads", type=int, default=None,
+                        help="Inter-op thread count, fixed for the whole process")
+    parser.add_argument("--profile", action="store_true",
+                        help="Also profile each eager run per module and layer type with torch.profiler")
+    parser.add_argument("--profile-dir", default="./logs/profiles",
+                        help="Where the per-module tables and Chrome traces are written")
+    parser.add_argument("--profile-runs", type=int, default=10, help="Profiled forward passes per model")
+    parser.add_argument("--logit-cache", default=CACHE_DIR,
+                        help="Directory of cached test-set logits, reused for unchanged checkpoints ('' disables it)")
+    return parser.parse_args()
+
+
+# Main benchmarking function
+def main():
+    args = parse_args()
+    if args.interop_threads:
+        # Only settable before any inter-op work has run, so it cannot be swept within one process
+        torch.set_num_interop_threads(args.interop_threads)
+
+    # Index saved_models/ once; only the selected checkpoints are ever constructed
+    entries = build_index(args.models_dir)
+    if args.list:
+        for entry in entries:
+            val_map = f"{entry['val_map']:.4f}" if entry["val_map"] is not None else "-"
+            print(f"{entry['file']:<70} {entry['backbone'] or '?':<20} val_map={val_map:<8} "
+                  f"{entry['size_bytes'] / 2 ** 20:7.1f} MiB  {entry['sha256'][:12]}")
+        return
+    selected = select_checkpoints(entries, backbones=args.models, files=args.checkpoints,
+                                  tag=None if args.tag == "all" else args.tag, latest_only=not args.all_versions)
+    if not selected:
+        print(f"No matching checkpoints found in {args.models_dir}.")
+        return
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    test_loader = load_test_dataset()
+
+    # Cached logits are only valid for the exact same evaluation data
+    fingerprint = test_loader.dataset.fingerprint() if hasattr(test_loader.dataset, "fingerprint") else None
+
+    # Initialize CSV Logger
+    logger = CSVLogger(save_dir="./logs", name="benchmark_logs")
+    trainer = Trainer(logger=logger, accelerator=device, devices=1, max_epochs=1, inference_mode=True)
+
+    # fp32 runs first so the other precisions can be compared against it
+    precisions = sorted(dict.fromkeys(args.precision), key=lambda p: lightning_precision(p) != "32-true")
+
+    # Every checkpoint shares the same test loader and trainer
+    benchmarks = []
+    for entry in selected:
+        label = benchmark_label(entry, selected)
+        spec = get_backbone(entry["backbone"])
+        mean, std = spec["normalization"]()
+        model = load_checkpoint_model(entry, device)
+
+        reference = None
+        for precision in precisions:
+            # bf16-true converts weights in place, so it gets its own copy
+            run_model = copy.deepcopy(model) if lightning_precision(precision) == "bf16-true" else model
+
+            eager_results = None
+            for compiled in [False, True] if args.compile else [False]:
+                tags = ([precision] if len(precisions) > 1 else []) + (["compiled"] if compiled else [])
+                run_label = f"{label} [{', '.join(tags)}]" if tags else label
+                print(f"\nBenchmarking {run_label} ({entry['file']})...")
+                # Logits are reused when checkpoint, data, preprocessing and precision are unchanged
+                cache_dir = cache_key = None
+                if args.logit_cache and fingerprint is not None:
+                    preprocessing = {"image_size": spec["image_size"], "mean": list(mean), "std": list(std)}
+                    cache_dir, cache_key = logit_cache_dir(args.logit_cache, entry["sha256"], fingerprint,
+                                                           preprocessing, precision, compiled)
+                benchmark = BenchmarkModel(
+                    run_model, test_loader, run_label,
+                    input_transform=BatchResizeNormalize(spec["image_size"], mean, std), image_size=spec["image_size"],
+                    precision=precision, compile=compiled,
+                )
+                run_test(benchmark, trainer, test_loader, cache_dir, cache_key)
+                benchmark.benchmark_speed(device)
+                benchmark.measure_model_size()
+                if args.profile and not compiled:
+                    # Module hooks do not fire inside compiled graphs, so only eager runs are profiled
+                    print(f"\nLayer profile for {run_label}...")
+                    benchmark.profile_layers(device, output_dir=args.profile_dir, num_runs=args.profile_runs)
+                if args.sweep:
+                    print(f"\nThroughput sweep for {run_label}...")
+                    benchmark.sweep_throughput(device, batch_sizes=args.batch_sizes, thread_counts=args.threads)
+                benchmark.results["checkpoint"] = entry["file"]
+                benchmark.results["init_checkpoint"] = entry.get("init_checkpoint")
+                benchmark.results["precision_mode"] = precision
+                benchmark.results["backbone"] = entry["backbone"]
+                benchmark.results["compiled"] = compiled
+
+                if compiled:
+                    benchmark.results.update(benchmark.compiled_forward.summary())
+                    benchmark.results["eager_speedup"] = eager_results["latency"] / benchmark.results["latency"]
+                    print(f"Compile time: {benchmark.results['compile_time']:.2f}s, "
+                          f"graph breaks: {benchmark.results['graph_breaks']}, "
+                          f"speedup vs eager: {benchmark.results['eager_speedup']:.2f}x")
+                else:
+                    eager_results = benchmark.results
+                if lightning_precision(precision) == "32-true" and not compiled:
+                    reference = benchmark.results
+                elif reference is not None:
+                    compare_to_reference(benchmark.results, reference)
+
+                # Keep the results, release the weights before constructing the next model
+                benchmark.model = None
+                benchmark.compiled_forward = None
+                benchmarks.append(benchmark)
+        del model
+
+    compare_native_to_base(benchmarks)
+    if args.sweep:
+        save_sweep_results(benchmarks)
+    if args.profile:
+        save_layer_profiles(benchmarks)
+    save_results(benchmarks)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,103 @@
+import os
+import re
+import json
+import torch
+
+from file_store import file_hash, write_json
+from models.engine import BACKBONES
+
+INDEX_FILE = "index.json"
+
+# Filenames written by the training engine's ModelCheckpoint callbacks, e.g.
+# DeiTTinyForClassification_2024-11-27_22-38-14_best.ckpt
+CHECKPOINT_PATTERN = re.compile(
+    r"^(?P<model_name>[A-Za-z0-9]+)_(?P<timestamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})_(?P<tag>.+)\.ckpt$"
+)
+
+
+def read_checkpoint_metadata(path):
+    """Pull the epoch and best val_map out of a Lightning checkpoint without touching its tensors."""
+    # mmap avoids reading the weights into memory just to get at the metadata
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=False)
+    val_map = None
+    for state in checkpoint.get("callbacks", {}).values():
+        if isinstance(state, dict) and state.get("monitor") == "val_map" and state.get("best_model_score") is not None:
+            val_map = float(state["best_model_score"])
+    # Checkpoint this run was initialized from (e.g. the base checkpoint of a native variant)
+    init_checkpoint = checkpoint.get("hyper_parameters", {}).get("init_checkpoint")
+    return {"epoch": checkpoint.get("epoch"), "val_map": val_map,
+            "init_checkpoint": os.path.basename(init_checkpoint) if init_checkpoint else None}
+
+
+def build_index(models_dir="saved_models"):
+    """
+    Scan `models_dir` for checkpoints and return their index, sorted by model and timestamp.
+    The index is persisted to `models_dir/index.json`; files whose size and mtime are unchanged
+    are not re-hashed or re-opened.
+    """
+    index_path = os.path.join(models_dir, INDEX_FILE)
+    cached = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            cached = {entry["file"]: entry for entry in json.load(f)}
+
+    backbone_by_name = {spec["name"]: key for key, spec in BACKBONES.items()}
+    entries = []
+    for file_name in sorted(os.listdir(models_dir)) if os.path.isdir(models_dir) else []:
+        match = CHECKPOINT_PATTERN.match(file_name)
+        if match is None:
+            continue
+        path = os.path.join(models_dir, file_name)
+        stat = os.stat(path)
+        entry = cached.get(file_name)
+        if (entry is None or entry["size_bytes"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns
+                or "init_checkpoint" not in entry):
+            entry = {
+                "file": file_name,
+                "model_name": match["model_name"],
+                "backbone": backbone_by_name.get(match["model_name"]),
+                "timestamp": match["timestamp"],
+                "tag": match["tag"],
+                "size_bytes": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": file_hash(path),
+                **read_checkpoint_metadata(path),
+            }
+        entry["path"] = path
+        entries.append(entry)
+
+    entries.sort(key=lambda entry: (entry["model_name"], entry["timestamp"], entry["tag"]))
+    if os.path.isdir(models_dir):
+        write_json(index_path, entries)
+    return entries
+
+
+def select_checkpoints(entries, backbones=None, files=None, tag="best", latest_only=True):
+    """
+    Filter an index down to the checkpoints to benchmark.
+    :param entries: Output of `build_index`.
+    :param backbones: Backbone keys or model names to keep (default: all known backbones).
+    :param files: Explicit checkpoint filenames; overrides every other filter.
+    :param tag: Checkpoint tag to keep, e.g. "best" (None keeps every tag).
+    :param latest_only: Keep only the newest matching checkpoint per model.
+    """
+    if files:
+        wanted = {os.path.basename(f) for f in files}
+        selected = [entry for entry in entries if entry["file"] in wanted]
+        missing = wanted - {entry["file"] for entry in selected}
+        if missing:
+            raise FileNotFoundError(f"Checkpoints not found in index: {sorted(missing)}")
+        return selected
+
+    selected = [
+        entry for entry in entries
+        if entry["backbone"] is not None
+        and (backbones is None or entry["backbone"] in backbones or entry["model_name"] in backbones)
+        and (tag is None or entry["tag"] == tag)
+    ]
+    if latest_only:
+        latest = {}
+        for entry in selected:  # Entries are sorted by timestamp, so the last one wins
+            latest[entry["model_name"]] = entry
+        selected = list(latest.values())
+    return selected
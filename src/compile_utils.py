@@ -0,0 +1,62 @@
+import time
+import warnings
+import torch
+from torch._dynamo.utils import counters
+
+from timing import synchronize
+
+
+def graph_count():
+    return counters["stats"]["unique_graphs"]
+
+
+def graph_break_count():
+    return sum(counters["graph_break"].values())
+
+
+class CompiledForward:
+    """
+    torch.compile'd forward for a module, with compile-time accounting and eager fallback.
+
+    The module itself is left untouched (no `_orig_mod.` prefix in its state_dict). Calls that
+    trigger a (re)compilation are timed into `compile_time` rather than counting as steady-state
+    work; `graph_breaks` counts the breaks Dynamo reported while compiling. If compilation fails,
+    a warning is issued and every later call runs eagerly.
+    """
+
+    def __init__(self, module, mode="default"):
+        self.module = module
+        self.mode = mode
+        self.compiled = torch.compile(module.forward, mode=mode)
+        self.compile_time = 0.0
+        self.compilations = 0
+        self.graph_breaks = 0
+        self.failed = False
+
+    def __call__(self, x):
+        if self.failed:
+            return self.module(x)
+
+        graphs_before, breaks_before = graph_count(), graph_break_count()
+        start = time.perf_counter()
+        try:
+            outputs = self.compiled(x)
+        except Exception as e:
+            warnings.warn(f"torch.compile failed, falling back to eager: {e}")
+            self.failed = True
+            return self.module(x)
+
+        if graph_count() != graphs_before:
+            synchronize(x.device)
+            self.compile_time += time.perf_counter() - start
+            self.compilations += 1
+            self.graph_breaks += graph_break_count() - breaks_before
+        return outputs
+
+    def summary(self):
+        return {
+            "compile_time": self.compile_time,
+            "compilations": self.compilations,
+            "graph_breaks": self.graph_breaks,
+            "compile_fallback": self.failed,
+        }
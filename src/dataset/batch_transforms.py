@@ -0,0 +1,19 @@
+import torch
+import torch.nn.functional as F
+
+
+class BatchResizeNormalize(torch.nn.Module):
+    """Resizes and normalizes a whole uint8 batch with one vectorized kernel on the model's device."""
+
+    def __init__(self, image_size=224, mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5)):
+        super().__init__()
+        self.image_size = image_size
+        # Non-persistent so checkpoints keep the same state_dict keys as before
+        self.register_buffer("mean", torch.tensor(mean).view(1, -1, 1, 1) * 255.0, persistent=False)
+        self.register_buffer("std", torch.tensor(std).view(1, -1, 1, 1) * 255.0, persistent=False)
+
+    def forward(self, x):
+        x = x.float()
+        if x.shape[-1] != self.image_size or x.shape[-2] != self.image_size:
+            x = F.interpolate(x, size=(self.image_size, self.image_size), mode="bilinear", align_corners=False)
+        return (x - self.mean) / self.std
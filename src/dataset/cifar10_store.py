@@ -0,0 +1,171 @@
+import os
+import pickle
+import numpy as np
+import torch
+from PIL import Image
+
+from file_store import MemmapDataset, file_hash, read_index, invalidate_index, write_index
+
+# Single dataset root shared by training, benchmarking, quantization and the dataset scripts
+DATA_DIR = "data/cifar10"
+BATCHES_DIR = "cifar-10-batches-py"
+PACKED_DIR = "packed"
+
+CLASS_NAMES = ["airplane", "automobile", "bird", "cat", "deer", "dog", "frog", "horse", "ship", "truck"]
+
+BATCH_SIZE = 10000
+SPLIT_SIZES = {"train": 50000, "test": 10000}
+# Pickle batch name -> (split, first row in the packed array)
+BATCH_SLOTS = {
+    **{f"data_batch_{i}": ("train", (i - 1) * BATCH_SIZE) for i in range(1, 6)},
+    "test_batch": ("test", 0),
+}
+
+
+def packed_dir(data_dir=DATA_DIR):
+    return os.path.join(data_dir, PACKED_DIR)
+
+
+def read_batch(file):
+    """
+    Parse one CIFAR-10 pickle batch.
+    :param file: Open binary file object of the batch.
+    :return: (uint8 images of shape (N, 3, 32, 32), int64 labels)
+    """
+    batch = pickle.load(file, encoding="bytes")
+    # Rows are stored channel-planar, so this reshape is already NCHW
+    images = np.asarray(batch[b"data"], dtype=np.uint8).reshape(-1, 3, 32, 32)
+    return images, np.asarray(batch[b"labels"], dtype=np.int64)
+
+
+def read_packed_index(data_dir=DATA_DIR):
+    """Return the packed store's index, or None if it is missing or incomplete."""
+    return read_index(packed_dir(data_dir))
+
+
+def pack_batches(batches, data_dir=DATA_DIR, source=None):
+    """
+    Write CIFAR-10 pickle batches into one contiguous uint8 array per split.
+    :param batches: Iterable of (batch name, binary file object), in any order; other names are skipped.
+    :param data_dir: Dataset root; the arrays go to `data_dir/packed/`.
+    :param source: Free-form description of where the batches came from.
+    :return: The packed store's index.
+    """
+    out_dir = packed_dir(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    invalidate_index(out_dir)
+
+    images = {split: np.lib.format.open_memmap(os.path.join(out_dir, f"{split}_images.npy"), mode="w+",
+                                               dtype=np.uint8, shape=(size, 3, 32, 32))
+              for split, size in SPLIT_SIZES.items()}
+    labels = {split: np.zeros(size, dtype=np.int64) for split, size in SPLIT_SIZES.items()}
+    written = set()
+    for name, file in batches:
+        if name not in BATCH_SLOTS:
+            continue
+        split, offset = BATCH_SLOTS[name]
+        batch_images, batch_labels = read_batch(file)
+        images[split][offset:offset + len(batch_labels)] = batch_images
+        labels[split][offset:offset + len(batch_labels)] = batch_labels
+        written.add(name)
+
+    missing = set(BATCH_SLOTS) - written
+    if missing:
+        raise FileNotFoundError(f"CIFAR-10 batches missing from {source or 'input'}: {sorted(missing)}")
+
+    for split in SPLIT_SIZES:
+        images[split].flush()
+        np.save(os.path.join(out_dir, f"{split}_labels.npy"), labels[split])
+    del images
+
+    index = {"splits": SPLIT_SIZES, "shape": [3, 32, 32], "source": source, "complete": True}
+    write_index(out_dir, index)
+    return index
+
+
+def pack_cifar10(data_dir=DATA_DIR):
+    """Pack previously extracted pickle batches under `data_dir`, or fetch and pack the archive if there are none."""
+    batches_dir = os.path.join(data_dir, BATCHES_DIR)
+    if not all(os.path.exists(os.path.join(batches_dir, name)) for name in BATCH_SLOTS):
+        from dataset.initialize_dataset import initialize_cifar10
+        return initialize_cifar10(data_dir, force=True)
+
+    def batches():
+        for name in BATCH_SLOTS:
+            with open(os.path.join(batches_dir, name), "rb") as f:
+                yield name, f
+
+    return pack_batches(batches(), data_dir, source=batches_dir)
+
+
+def ensure_packed(data_dir=DATA_DIR):
+    """Return the packed store's index, packing the dataset on first use."""
+    index = read_packed_index(data_dir)
+    if index is None:
+        print(f"Packing CIFAR-10 into {packed_dir(data_dir)}...")
+        index = pack_cifar10(data_dir)
+        print("Packing complete.")
+    return index
+
+
+def load_split(split="train", data_dir=DATA_DIR):
+    """
+    Open one split of the packed store.
+    :return: (memory-mapped uint8 images of shape (N, 3, 32, 32), int64 labels)
+    """
+    ensure_packed(data_dir)
+    out_dir = packed_dir(data_dir)
+    images = np.load(os.path.join(out_dir, f"{split}_images.npy"), mmap_mode="c")
+    return images, np.load(os.path.join(out_dir, f"{split}_labels.npy"))
+
+
+def split_indices(data_dir=DATA_DIR, val_fraction=0.2, seed=42):
+    """
+    Train/validation indices into the packed train split, generated once and persisted,
+    so every run (and every DDP rank) trains and validates on the same images.
+    :return: (train indices, validation indices)
+    """
+    path = os.path.join(packed_dir(data_dir), f"split_seed{seed}_val{val_fraction}.npz")
+    if not os.path.exists(path):
+        ensure_packed(data_dir)
+        permutation = np.random.default_rng(seed).permutation(SPLIT_SIZES["train"])
+        num_val = int(round(SPLIT_SIZES["train"] * val_fraction))
+        # Written to a temporary file first, so concurrent ranks never read a partial split
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, train=np.sort(permutation[num_val:]), val=np.sort(permutation[:num_val]))
+        os.replace(tmp_path, path)
+    with np.load(path) as split:
+        return split["train"], split["val"]
+
+
+class PackedCIFAR10(MemmapDataset):
+    """
+    One split of the packed store. Samples are raw uint8 (3, 32, 32) tensors read straight from the
+    memory-mapped array, or `transform(PIL image)` when a per-image transform is given.
+    """
+
+    def __init__(self, split="train", data_dir=DATA_DIR, transform=None):
+        self.split = split
+        self.data_dir = data_dir
+        self.transform = transform
+        ensure_packed(data_dir)
+        self.labels = torch.from_numpy(np.load(os.path.join(packed_dir(data_dir), f"{split}_labels.npy")))
+
+    @property
+    def images(self):
+        return self.mapped(os.path.join(packed_dir(self.data_dir), f"{self.split}_images.npy"))
+
+    def fingerprint(self):
+        """SHA-256 over this split's packed image and label files."""
+        out_dir = packed_dir(self.data_dir)
+        return file_hash([os.path.join(out_dir, f"{self.split}_images.npy"),
+                          os.path.join(out_dir, f"{self.split}_labels.npy")])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        image = self.images[idx]
+        if self.transform is not None:
+            return self.transform(Image.fromarray(image.transpose(1, 2, 0))), self.labels[idx]
+        return torch.from_numpy(image), self.labels[idx]
@@ -1,32 +1,146 @@
 import os
+import sys
+import hashlib
 import tarfile
+import argparse
+import urllib.error
+import urllib.parse
 import urllib.request
 
-def download_and_extract_cifar10(data_dir="data/cifar10"):
-    """Download and extract CIFAR-10 dataset."""
-    url = "https://www.cs.toronto.edu/~kriz/cifar-10-python.tar.gz"
-    tar_path = os.path.join(data_dir, "cifar-10-python.tar.gz")
-    extracted_dir = os.path.join(data_dir, "cifar-10-batches-py")
-    
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    
-    # Download CIFAR-10 dataset
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from file_store import file_hash
+from dataset.cifar10_store import DATA_DIR, BATCH_SLOTS, pack_batches, read_packed_index
+
+CIFAR10_URL = "https://www.cs.toronto.edu/~kriz/cifar-10-python.tar.gz"
+CIFAR10_MD5 = "c58f30108f718f92721af3b95e74349a"
+ARCHIVE_NAME = "cifar-10-python.tar.gz"
+
+
+def local_path(url):
+    """Filesystem path for a plain path or file:// URL, None for remote URLs."""
+    if os.path.exists(url):
+        return url
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == "file":
+        return urllib.request.url2pathname(parsed.path)
+    return None
+
+
+def open_source(url, offset):
+    """
+    Open `url` for reading from byte `offset`.
+    :return: (readable file object, whether it actually starts at `offset` rather than 0).
+        The file object is None when `offset` is already at the end of the file.
+    """
+    path = local_path(url)
+    if path is not None:
+        source = open(path, "rb")
+        source.seek(offset)
+        return source, True
+    request = urllib.request.Request(url, headers={"Range": f"bytes={offset}-"} if offset else {})
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as e:
+        # 416: the range starts at the end of the file, i.e. a previous run already fetched all of it
+        if e.code == 416 and offset:
+            e.close()
+            return None, True
+        raise
+    # Servers without range support answer 200 with the whole file
+    return response, offset == 0 or response.status == 206
+
+
+def fetch(url, path, md5=None, chunk_size=1 << 20):
+    """
+    Download `url` to `path` in chunks, resuming a previous partial download.
+    Data goes to `path.part` and is only renamed to `path` once complete and, if `md5` is given,
+    verified, so an interrupted or corrupt download is never mistaken for a finished one.
+    """
+    part_path = f"{path}.part"
+    digest = hashlib.md5()
+    offset = 0
+    if os.path.exists(part_path):
+        # Hash what is already there so the final checksum covers the whole file
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+                offset += len(chunk)
+        print(f"Resuming download at {offset / 2 ** 20:.1f} MiB...")
+
+    source, resumed = open_source(url, offset)
+    if not resumed:
+        offset, digest = 0, hashlib.md5()
+    if source is not None:
+        with source, open(part_path, "ab" if resumed else "wb") as out:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                out.write(chunk)
+                digest.update(chunk)
+                offset += len(chunk)
+                print(f"\rDownloaded {offset / 2 ** 20:.1f} MiB", end="", flush=True)
+        print()
+
+    if md5 and digest.hexdigest() != md5:
+        os.remove(part_path)
+        raise ValueError(f"Checksum mismatch for {url}: expected {md5}, got {digest.hexdigest()}")
+    os.replace(part_path, path)
+    return path
+
+
+def pack_archive(tar_path, data_dir=DATA_DIR, source=None):
+    """Decompress the CIFAR-10 tarball as a stream straight into the packed arrays, without extracting it."""
+    with tarfile.open(tar_path, "r|gz") as tar:
+        def batches():
+            for member in tar:
+                name = os.path.basename(member.name)
+                if member.isfile() and name in BATCH_SLOTS:
+                    yield name, tar.extractfile(member)
+
+        return pack_batches(batches(), data_dir, source=source or tar_path)
+
+
+def initialize_cifar10(data_dir=DATA_DIR, url=CIFAR10_URL, md5=CIFAR10_MD5, force=False):
+    """
+    Fetch, verify and pack CIFAR-10.
+    :param data_dir: Dataset root.
+    :param url: Remote URL, file:// URL or local path of the CIFAR-10 python tarball (e.g. a mirror).
+    :param md5: Expected MD5 of the tarball; None skips verification.
+    :param force: Re-pack even if a complete packed store already exists.
+    :return: The packed store's index.
+    """
+    index = read_packed_index(data_dir)
+    if index is not None and not force:
+        print("CIFAR-10 dataset already initialized.")
+        return index
+
+    os.makedirs(data_dir, exist_ok=True)
+    tar_path = os.path.join(data_dir, ARCHIVE_NAME)
+    if os.path.exists(tar_path) and md5 and file_hash(tar_path, "md5") != md5:
+        print("Existing CIFAR-10 archive failed verification, downloading again.")
+        os.remove(tar_path)
+
     if not os.path.exists(tar_path):
-        print("Downloading CIFAR-10 dataset...")
-        urllib.request.urlretrieve(url, tar_path)
+        print(f"Downloading CIFAR-10 dataset from {url}...")
+        fetch(url, tar_path, md5=md5)
         print("Download complete.")
     else:
         print("CIFAR-10 dataset already downloaded.")
 
-    # Extract the dataset
-    if not os.path.exists(extracted_dir):
-        print("Extracting CIFAR-10 dataset...")
-        with tarfile.open(tar_path, "r:gz") as tar:
-            tar.extractall(path=data_dir)
-        print("Extraction complete.")
-    else:
-        print("CIFAR-10 dataset already extracted.")
+    print("Packing CIFAR-10 dataset...")
+    index = pack_archive(tar_path, data_dir, source=url)
+    print("Packing complete.")
+    return index
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download, verify and pack the CIFAR-10 dataset.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--url", default=os.getenv("CIFAR10_URL", CIFAR10_URL),
+                        help="Mirror URL, file:// URL or local path of cifar-10-python.tar.gz")
+    parser.add_argument("--md5", default=CIFAR10_MD5, help="Expected archive MD5 ('' skips verification)")
+    parser.add_argument("--force", action="store_true", help="Re-pack even if the dataset is already packed")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    download_and_extract_cifar10()
+    args = parse_args()
+    initialize_cifar10(args.data_dir, args.url, args.md5 or None, force=args.force)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+import torchvision.transforms.functional as TF
+
+from file_store import MemmapDataset, read_index, invalidate_index, write_index
+
+IMAGES_FILE = "images.npy"
+LABELS_FILE = "labels.npy"
+STORAGE_DTYPES = {"uint8": np.uint8, "float16": np.float16, "float32": np.float32}
+
+
+def cache_key(name, image_size, storage="uint8", mean=(0.5, 0.5, 0.5), std=(0.5, 0.5, 0.5)):
+    """Directory name for a cache built with the given preprocessing config."""
+    # Normalization is part of the key for every storage mode: float caches bake it in, and uint8
+    # caches apply the stats saved in their index on read, so backbones must not share one
+    stats = json.dumps([[float(v) for v in mean], [float(v) for v in std]]).encode()
+    return f"{name}_{image_size}px_{storage}_{hashlib.sha1(stats).hexdigest()[:8]}"
+
+
+def build_tensor_cache(images, labels, cache_dir, image_size=224, mean=(0.5, 0.5, 0.5),
+                       std=(0.5, 0.5, 0.5), storage="uint8", chunk_size=512, source=None):
+    """
+    Resize a uint8 image array once and write it to a memory-mapped .npy file.
+    :param images: uint8 array of shape (N, H, W, C), e.g. `datasets.CIFAR10(...).data`.
+    :param labels: Sequence of N integer labels.
+    :param cache_dir: Directory to write the cache into.
+    :param image_size: Target square resolution.
+    :param mean: Per-channel normalization mean.
+    :param std: Per-channel normalization std.
+    :param storage: "uint8" stores resized pixels and normalizes on read,
+                    "float16"/"float32" store already-normalized tensors.
+    :param chunk_size: Number of images resized per vectorized call.
+    :param source: Free-form description of where the images came from.
+    :return: The cache index.
+    """
+    if storage not in STORAGE_DTYPES:
+        raise ValueError(f"Unknown storage '{storage}', expected one of {list(STORAGE_DTYPES)}")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    invalidate_index(cache_dir)
+
+    images = np.asarray(images)
+    num_samples = images.shape[0]
+    channels = images.shape[3]
+    shape = (num_samples, channels, image_size, image_size)
+    out = np.lib.format.open_memmap(
+        os.path.join(cache_dir, IMAGES_FILE), mode="w+", dtype=STORAGE_DTYPES[storage], shape=shape
+    )
+
+    mean_t = torch.tensor(mean).view(1, -1, 1, 1)
+    std_t = torch.tensor(std).view(1, -1, 1, 1)
+    for start in range(0, num_samples, chunk_size):
+        chunk = torch.from_numpy(images[start:start + chunk_size]).permute(0, 3, 1, 2)
+        chunk = TF.resize(chunk.float(), [image_size, image_size], antialias=True)
+        if storage == "uint8":
+            chunk = chunk.round().clamp_(0, 255).to(torch.uint8)
+        else:
+            chunk = (chunk / 255.0 - mean_t) / std_t
+        out[start:start + chunk.shape[0]] = chunk.numpy().astype(out.dtype, copy=False)
+    out.flush()
+    del out
+
+    np.save(os.path.join(cache_dir, LABELS_FILE), np.asarray(labels, dtype=np.int64))
+
+    index = {
+        "num_samples": num_samples,
+        "shape": list(shape),
+        "storage": storage,
+        "image_size": image_size,
+        "mean": list(mean),
+        "std": list(std),
+        "source": source,
+        "complete": True,
+    }
+    write_index(cache_dir, index)
+    return index
+
+
+def get_or_build_cache(images, labels, cache_root, name, image_size=224, mean=(0.5, 0.5, 0.5),
+                       std=(0.5, 0.5, 0.5), storage="uint8", source=None):
+    """Return the cache directory for this config, building it on first use."""
+    cache_dir = os.path.join(cache_root, cache_key(name, image_size, storage, mean, std))
+    index = read_index(cache_dir)
+    if (index is None or index["num_samples"] != len(labels)
+            or not np.allclose(index["mean"], mean) or not np.allclose(index["std"], std)):
+        print(f"Building tensor cache at {cache_dir}...")
+        build_tensor_cache(images, labels, cache_dir, image_size=image_size, mean=mean, std=std,
+                           storage=storage, source=source)
+        print("Tensor cache complete.")
+    return cache_dir
+
+
+class CachedTensorDataset(MemmapDataset):
+    """Serves preprocessed samples as zero-copy views into a memory-mapped cache."""
+
+    def __init__(self, cache_dir, normalize=True):
+        self.cache_dir = cache_dir
+        self.index = read_index(cache_dir)
+        if self.index is None:
+            raise FileNotFoundError(f"No complete tensor cache found in {cache_dir}")
+        self.labels = torch.from_numpy(np.load(os.path.join(cache_dir, LABELS_FILE)))
+        self.normalize = normalize and self.index["storage"] == "uint8"
+        self.mean = torch.tensor(self.index["mean"]).view(-1, 1, 1)
+        self.std = torch.tensor(self.index["std"]).view(-1, 1, 1)
+
+    @property
+    def images(self):
+        return self.mapped(os.path.join(self.cache_dir, IMAGES_FILE))
+
+    def __len__(self):
+        return self.index["num_samples"]
+
+    def __getitem__(self, idx):
+        image = torch.from_numpy(self.images[idx])
+        if self.normalize:
+            image = (image.float() / 255.0 - self.mean) / self.std
+        elif image.dtype == torch.float16:
+            image = image.float()
+        return image, self.labels[idx]
@@ -0,0 +1,55 @@
+import os
+import torch
+from torch.utils.data import DataLoader
+
+from benchmark_models import load_checkpoint_model
+from checkpoint_registry import build_index
+from logit_cache import CACHE_DIR, logit_cache_dir, read_logit_cache, LogitCacheWriter
+from models.engine import get_backbone
+from dataset.batch_transforms import BatchResizeNormalize
+from dataset.cifar10_store import DATA_DIR, PackedCIFAR10
+
+
+def find_checkpoint_entry(checkpoint_path):
+    """Index entry (backbone, sha256, ...) of a checkpoint file, via its directory's registry."""
+    models_dir, file_name = os.path.split(os.path.abspath(checkpoint_path))
+    for entry in build_index(models_dir):
+        if entry["file"] == file_name:
+            return entry
+    raise FileNotFoundError(f"{checkpoint_path} is not a recognized checkpoint")
+
+
+def precompute_teacher_logits(checkpoint_path, data_dir=DATA_DIR, cache_root=CACHE_DIR, batch_size=256):
+    """
+    Run the teacher once over the whole packed train split and cache its logits on disk.
+    Rows follow the packed train split, so they stay aligned through the train/validation split.
+    :param checkpoint_path: Trained teacher checkpoint.
+    :param data_dir: Dataset root.
+    :param cache_root: Root of the logit cache; the entry is keyed by checkpoint hash and data fingerprint.
+    :return: Directory of the complete cache; `read_logit_cache` on it gives logits of shape (num_train_images, num_classes).
+    """
+    entry = find_checkpoint_entry(checkpoint_path)
+    spec = get_backbone(entry["backbone"])
+    mean, std = spec["normalization"]()
+    dataset = PackedCIFAR10("train", data_dir)
+    preprocessing = {"image_size": spec["image_size"], "mean": list(mean), "std": list(std)}
+    cache_dir, cache_key = logit_cache_dir(cache_root, entry["sha256"], dataset.fingerprint(), preprocessing, "fp32")
+
+    if read_logit_cache(cache_dir) is not None:
+        print(f"Using cached teacher logits from {cache_dir}")
+        return cache_dir
+
+    print(f"Computing teacher logits with {entry['file']}...")
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = load_checkpoint_model(entry, device).eval()
+    input_transform = BatchResizeNormalize(spec["image_size"], mean, std).to(device)
+    writer = None
+    with torch.inference_mode():
+        for images, labels in DataLoader(dataset, batch_size=batch_size, num_workers=4):
+            logits = model(input_transform(images.to(device))).float().cpu()
+            if writer is None:
+                writer = LogitCacheWriter(cache_dir, len(dataset), logits.shape[1], key={**cache_key, "teacher": entry["file"]})
+            writer.write(logits.numpy(), labels.numpy())
+    writer.finish()
+    print(f"Teacher logits cached in {cache_dir}")
+    return cache_dir
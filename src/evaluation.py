@@ -0,0 +1,178 @@
+import numpy as np
+
+
+def average_precision(scores, labels, num_classes):
+    """
+    Exact, tie-aware one-vs-rest Average Precision for every class at once.
+    :param scores: Predicted scores or probabilities (N x C array).
+    :param labels: True labels (N array).
+    :param num_classes: Number of classes.
+    :return: Per-class AP (C array). Classes without positives get 0.
+    """
+    scores = np.asarray(scores)
+    labels = np.asarray(labels)
+    num_samples = scores.shape[0]
+    truth = labels[:, None] == np.arange(num_classes)[None, :]
+
+    # A single argsort over the whole N x C matrix, descending per column
+    order = np.argsort(-scores, axis=0, kind="stable")
+    sorted_scores = np.take_along_axis(scores, order, axis=0)
+    sorted_truth = np.take_along_axis(truth, order, axis=0)
+
+    tp = np.cumsum(sorted_truth, axis=0, dtype=np.int64)
+    precision = tp / np.arange(1, num_samples + 1)[:, None]
+
+    # Tied scores form one threshold: every sample in a tie group uses the precision at the group's end
+    group_end = np.ones_like(sorted_truth)
+    group_end[:-1] = sorted_scores[1:] != sorted_scores[:-1]
+    end_index = np.where(group_end, np.arange(num_samples)[:, None], num_samples - 1)
+    end_index = np.minimum.accumulate(end_index[::-1], axis=0)[::-1]
+    precision = np.take_along_axis(precision, end_index, axis=0)
+
+    positives = tp[-1] if num_samples else np.zeros(num_classes, dtype=np.int64)
+    ap = (sorted_truth * precision).sum(axis=0)
+    return np.divide(ap, positives, out=np.zeros(num_classes), where=positives > 0)
+
+
+class StreamingAveragePrecision:
+    """
+    Per-class AP from score histograms, updated batch by batch.
+    Memory is O(C x num_bins) regardless of how many samples are seen; scores
+    falling in the same bin are treated as tied, so the result converges to the
+    exact AP as num_bins grows. With num_bins=None every score is kept instead and
+    the exact, tie-aware AP is computed (memory O(N x C)).
+    """
+
+    def __init__(self, num_classes, num_bins=1000):
+        self.num_classes = num_classes
+        self.num_bins = num_bins
+        self.reset()
+
+    def reset(self):
+        if self.num_bins is None:
+            self.scores, self.labels = [], []
+            return
+        self.positives = np.zeros((self.num_classes, self.num_bins), dtype=np.int64)
+        self.negatives = np.zeros((self.num_classes, self.num_bins), dtype=np.int64)
+
+    def update(self, probs, labels):
+        """
+        :param probs: Predicted probabilities in [0, 1] (B x C array).
+        :param labels: True labels (B array).
+        """
+        probs = np.asarray(probs)
+        labels = np.asarray(labels)
+        if self.num_bins is None:
+            self.scores.append(probs.copy())
+            self.labels.append(labels.copy())
+            return
+        bins = np.clip((probs * self.num_bins).astype(np.int64), 0, self.num_bins - 1)
+        flat = (bins + np.arange(self.num_classes)[None, :] * self.num_bins).ravel()
+        truth = (labels[:, None] == np.arange(self.num_classes)[None, :]).ravel()
+        size = self.num_classes * self.num_bins
+        self.positives += np.bincount(flat[truth], minlength=size).reshape(self.num_classes, -1)
+        self.negatives += np.bincount(flat[~truth], minlength=size).reshape(self.num_classes, -1)
+
+    def compute(self):
+        """:return: Per-class AP (C array). Classes without positives get 0."""
+        if self.num_bins is None:
+            if not self.labels:
+                return np.zeros(self.num_classes)
+            return average_precision(np.concatenate(self.scores), np.concatenate(self.labels), self.num_classes)
+        # Walk thresholds from the highest bin down
+        tp = np.cumsum(self.positives[:, ::-1], axis=1)
+        fp = np.cumsum(self.negatives[:, ::-1], axis=1)
+        predicted = tp + fp
+        precision = np.divide(tp, predicted, out=np.zeros(tp.shape), where=predicted > 0)
+        total = tp[:, -1]
+        ap = (self.positives[:, ::-1] * precision).sum(axis=1)
+        return np.divide(ap, total, out=np.zeros(self.num_classes), where=total > 0)
+
+
+class StreamingClassificationMetrics:
+    """
+    Classification metrics accumulated batch by batch from sufficient statistics only.
+
+    Keeps a C x C confusion matrix, top-k hit counters and a `StreamingAveragePrecision`, so memory
+    is independent of the number of samples. Accuracy, weighted precision/recall/F1 and the
+    per-class report match sklearn's; mAP carries the binning approximation of the AP histograms
+    unless num_bins is None, which keeps the scores and gives the exact AP.
+    """
+
+    def __init__(self, num_classes, top_k=(1, 5), num_bins=10000):
+        self.num_classes = num_classes
+        self.top_k = tuple(k for k in top_k if k <= num_classes)
+        self.average_precision = StreamingAveragePrecision(num_classes, num_bins)
+        self.reset()
+
+    def reset(self):
+        self.confusion = np.zeros((self.num_classes, self.num_classes), dtype=np.int64)
+        self.top_k_correct = dict.fromkeys(self.top_k, 0)
+        self.count = 0
+        self.average_precision.reset()
+
+    def update(self, logits, labels):
+        """
+        :param logits: Raw model outputs (B x C array).
+        :param labels: True labels (B array).
+        """
+        logits = np.asarray(logits, dtype=np.float64)
+        labels = np.asarray(labels)
+        preds = logits.argmax(axis=1)
+        self.confusion += np.bincount(labels * self.num_classes + preds,
+                                      minlength=self.num_classes ** 2).reshape(self.num_classes, -1)
+
+        # Rank of the true class = number of classes scored strictly higher
+        true_scores = np.take_along_axis(logits, labels[:, None], axis=1)
+        rank = (logits > true_scores).sum(axis=1)
+        for k in self.top_k:
+            self.top_k_correct[k] += int((rank < k).sum())
+        self.count += len(labels)
+
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        self.average_precision.update(probs / probs.sum(axis=1, keepdims=True), labels)
+
+    def per_class(self):
+        """:return: Per-class precision, recall, F1 and support (C arrays); undefined ratios are 0."""
+        tp = np.diag(self.confusion).astype(np.float64)
+        predicted = self.confusion.sum(axis=0)
+        support = self.confusion.sum(axis=1)
+        precision = np.divide(tp, predicted, out=np.zeros(self.num_classes), where=predicted > 0)
+        recall = np.divide(tp, support, out=np.zeros(self.num_classes), where=support > 0)
+        denominator = precision + recall
+        f1 = np.divide(2 * precision * recall, denominator, out=np.zeros(self.num_classes), where=denominator > 0)
+        return precision, recall, f1, support
+
+    def compute(self):
+        precision, recall, f1, support = self.per_class()
+        weights = support / max(self.count, 1)
+        results = {
+            "accuracy": np.trace(self.confusion) / max(self.count, 1),
+            "precision": float((precision * weights).sum()),
+            "recall": float((recall * weights).sum()),
+            "f1_score": float((f1 * weights).sum()),
+            "confusion_matrix": self.confusion.copy(),
+            "mAP": float(np.mean(self.average_precision.compute())),
+        }
+        for k in self.top_k:
+            results[f"top{k}_accuracy"] = self.top_k_correct[k] / max(self.count, 1)
+        return results
+
+    def classification_report(self, target_names=None, digits=2):
+        """Text report in the layout of sklearn's `classification_report`."""
+        precision, recall, f1, support = self.per_class()
+        target_names = target_names or [str(i) for i in range(self.num_classes)]
+        width = max(max(len(name) for name in target_names), len("weighted avg"), digits)
+        header = f"{'':>{width}}  {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}\n\n"
+
+        def line(name, p, r, f, s):
+            return f"{name:>{width}}  {p:>9.{digits}f} {r:>9.{digits}f} {f:>9.{digits}f} {s:>9}\n"
+
+        report = header + "".join(line(*row) for row in zip(target_names, precision, recall, f1, support)) + "\n"
+        total = int(support.sum())
+        accuracy = np.trace(self.confusion) / max(total, 1)
+        report += f"{'accuracy':>{width}}  {'':>9} {'':>9} {accuracy:>9.{digits}f} {total:>9}\n"
+        report += line("macro avg", precision.mean(), recall.mean(), f1.mean(), total)
+        weights = support / max(total, 1)
+        report += line("weighted avg", (precision * weights).sum(), (recall * weights).sum(), (f1 * weights).sum(), total)
+        return report
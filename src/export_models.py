@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import torch
+
+from benchmark_models import load_checkpoint_model, load_test_dataset, benchmark_label
+from checkpoint_registry import build_index, select_checkpoints
+from models.engine import get_backbone
+from dataset.batch_transforms import BatchResizeNormalize
+from timing import measure_latency
+
+
+def export_torchscript(model, example_input, path):
+    """Trace the model to TorchScript and save it."""
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input)
+    traced = torch.jit.freeze(traced.eval())
+    traced.save(path)
+    return path
+
+
+def export_onnx(model, example_input, path, opset_version=17):
+    """Export the model to ONNX with a dynamic batch dimension."""
+    torch.onnx.export(
+        model, (example_input,), path,
+        input_names=["pixel_values"], output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset_version,
+        dynamo=False,
+    )
+    return path
+
+
+class EagerRunner:
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    def __call__(self, x):
+        with torch.inference_mode():
+            return self.model(x).numpy()
+
+
+class TorchScriptRunner:
+    name = "torchscript"
+
+    def __init__(self, path):
+        self.model = torch.jit.load(path).eval()
+
+    def __call__(self, x):
+        with torch.inference_mode():
+            return self.model(x).numpy()
+
+
+class OnnxRuntimeRunner:
+    name = "onnxruntime"
+
+    def __init__(self, path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("ONNX Runtime benchmarking requires `pip install onnxruntime`") from e
+        options = ort.SessionOptions()
+        # Same thread budget as PyTorch so the comparison is like for like
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        return self.session.run(None, {self.input_name: x.numpy()})[0]
+
+
+def benchmark_runners(runners, timing_input, parity_input, atol=1e-3, num_runs=100, warmup_runs=10):
+    """
+    Time every runner on the same input with the same harness, and check its logits against the first runner's.
+    :param runners: Callables taking a CPU tensor and returning numpy logits; the first is the reference.
+    :param timing_input: Input used for latency measurement.
+    :param parity_input: Real, preprocessed images used for the logits parity check.
+    :param atol: Largest absolute logits difference accepted as parity.
+    :return: List of result dicts, one per runner.
+    """
+    reference_logits = runners[0](parity_input)
+    results = []
+    for runner in runners:
+        logits = runner(parity_input)
+        max_diff = float(np.abs(logits - reference_logits).max())
+        same_top1 = float((logits.argmax(1) == reference_logits.argmax(1)).mean())
+        stats, _ = measure_latency(lambda: runner(timing_input), "cpu", num_runs=num_runs, warmup_runs=warmup_runs)
+        results.append({
+            "runtime": runner.name,
+            "max_abs_diff": max_diff,
+            "top1_agreement": same_top1,
+            "parity": max_diff <= atol,
+            "latency": stats["mean"],
+            "latency_p50": stats["p50"],
+            "latency_p99": stats["p99"],
+            "throughput": timing_input.shape[0] / stats["mean"],
+        })
+        print(f"{runner.name:<12} p50 {stats['p50'] * 1000:8.2f}ms  p99 {stats['p99'] * 1000:8.2f}ms  "
+              f"max |diff| {max_diff:.2e}  top-1 agreement {same_top1:.1%}  parity {'OK' if max_diff <= atol else 'FAILED'}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export checkpoints to TorchScript/ONNX and benchmark each runtime.")
+    parser.add_argument("--models-dir", default="./saved_models")
+    parser.add_argument("--models", nargs="+", default=None, help="Backbones to export (default: all)")
+    parser.add_argument("--checkpoints", nargs="+", default=None, help="Explicit checkpoint filenames")
+    parser.add_argument("--output-dir", default="./saved_models/exported")
+    parser.add_argument("--runtimes", nargs="+", default=["torchscript", "onnxruntime"],
+                        choices=["torchscript", "onnxruntime"], help="Runtimes to compare against eager PyTorch")
+    parser.add_argument("--batch-size", type=int, default=1, help="Batch size for latency measurement")
+    parser.add_argument("--atol", type=float, default=1e-3, help="Logits parity tolerance vs eager")
+    parser.add_argument("--num-runs", type=int, default=100)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    device = "cpu"
+
+    selected = select_checkpoints(build_index(args.models_dir), backbones=args.models, files=args.checkpoints)
+    if not selected:
+        print(f"No matching checkpoints found in {args.models_dir}.")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    # One real test batch, shared by every model's parity check
+    parity_images, _ = next(iter(load_test_dataset(num_workers=0)))
+
+    all_results = {}
+    for entry in selected:
+        label = benchmark_label(entry, selected)
+        spec = get_backbone(entry["backbone"])
+        mean, std = spec["normalization"]()
+        input_transform = BatchResizeNormalize(spec["image_size"], mean, std)
+        model = load_checkpoint_model(entry, device).eval()
+
+        stem = os.path.splitext(entry["file"])[0]
+        timing_input = torch.randn(args.batch_size, 3, spec["image_size"], spec["image_size"])
+        parity_input = input_transform(parity_images)
+
+        print(f"\nExporting {label} ({entry['file']})...")
+        runners = [EagerRunner(model)]
+        if "torchscript" in args.runtimes:
+            path = export_torchscript(model, timing_input, os.path.join(args.output_dir, f"{stem}.torchscript.pt"))
+            runners.append(TorchScriptRunner(path))
+        if "onnxruntime" in args.runtimes:
+            path = export_onnx(model, timing_input, os.path.join(args.output_dir, f"{stem}.onnx"))
+            runners.append(OnnxRuntimeRunner(path))
+
+        # Input contract for the exported artifacts: they expect resized, normalized float images
+        with open(os.path.join(args.output_dir, f"{stem}.json"), "w") as f:
+            json.dump({"checkpoint": entry["file"], "backbone": entry["backbone"],
+                       "image_size": spec["image_size"], "mean": list(mean), "std": list(std)}, f, indent=2)
+
+        print(f"Benchmarking runtimes for {label}...")
+        all_results[label] = benchmark_runners(runners, timing_input, parity_input, atol=args.atol,
+                                               num_runs=args.num_runs)
+
+    results_path = "./logs/export_benchmark_results.json"
+    with open(results_path, "w") as f:
+        json.dump(all_results, f, indent=2)
+    print(f"\nExport benchmark results saved to: {results_path}")
+
+    # An export that does not reproduce eager's logits is broken, however fast it is
+    failed = [f"{label} ({result['runtime']}, max |diff| {result['max_abs_diff']:.2e})"
+              for label, results in all_results.items() for result in results if not result["parity"]]
+    if failed:
+        print(f"Parity check FAILED (--atol {args.atol}) for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
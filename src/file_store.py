@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+import numpy as np
+from torch.utils.data import Dataset
+
+# Every on-disk store (packed dataset, tensor cache, logit cache) describes itself in an index file
+# that is only marked complete once all of its arrays have been written
+INDEX_FILE = "index.json"
+
+
+def file_hash(paths, algorithm="sha256", chunk_size=1 << 20):
+    """
+    Hex digest of a file, read in chunks.
+    :param paths: One path, or several paths hashed in order into a single digest.
+    :param algorithm: Any `hashlib` algorithm name, e.g. "sha256" or "md5".
+    """
+    digest = hashlib.new(algorithm)
+    for path in [paths] if isinstance(paths, (str, os.PathLike)) else paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json(path, data):
+    """Write JSON through a temporary file and os.replace, so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_index(directory):
+    """Return the store's index, or None if it is missing or incomplete."""
+    index_path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    return index if index.get("complete") else None
+
+
+def invalidate_index(directory):
+    """Remove the store's index before rewriting its arrays, so a partial rebuild is never read."""
+    index_path = os.path.join(directory, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+
+def write_index(directory, index):
+    write_json(os.path.join(directory, INDEX_FILE), index)
+
+
+class MemmapDataset(Dataset):
+    """
+    Base for datasets backed by memory-mapped .npy files. Arrays are opened lazily and never pickled,
+    so each DataLoader worker maps the files itself instead of receiving a copy of the data.
+    """
+
+    def mapped(self, path, mmap_mode="c"):
+        """The array at `path`, mapped on first use (copy-on-write by default: writable views, file untouched)."""
+        arrays = self.__dict__.setdefault("_mapped", {})
+        if path not in arrays:
+            arrays[path] = np.load(path, mmap_mode=mmap_mode)
+        return arrays[path]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_mapped"] = {}
+        return state
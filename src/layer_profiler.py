@@ -0,0 +1,171 @@
+import csv
+import torch
+from collections import defaultdict
+from torch.profiler import profile, record_function, ProfilerActivity
+
+MODULE_PREFIX = "module:"
+ACTIVATIONS = ("ReLU", "ReLU6", "Hardswish", "Hardsigmoid", "GELU", "GELUActivation", "SiLU", "Sigmoid")
+# Composite types own every op inside them, e.g. the Linear layers of an attention block count as attention
+COMPOSITE_TYPES = ("attention", "mlp", "se_block", "embedding")
+
+
+def layer_type(module):
+    """Layer category of a module, or None for plain containers (Sequential, encoder layers, whole blocks)."""
+    name = type(module).__name__
+    if name.endswith("Attention"):
+        return "attention"
+    if name.endswith("Intermediate") or (name.endswith("Output") and not name.endswith("SelfOutput")):
+        return "mlp"  # Hugging Face splits the transformer MLP into Intermediate (fc1 + GELU) and Output (fc2)
+    if name in ("SqueezeExcitation", "SElayer"):
+        return "se_block"
+    if name.endswith("Embeddings"):
+        return "embedding"
+    if isinstance(module, torch.nn.Conv2d):
+        if module.groups > 1 and module.groups == module.in_channels:
+            return "depthwise_conv"
+        return "pointwise_conv" if module.kernel_size == (1, 1) else "conv"
+    if isinstance(module, torch.nn.LayerNorm):
+        return "layernorm"
+    if isinstance(module, torch.nn.modules.batchnorm._BatchNorm):
+        return "batchnorm"
+    if isinstance(module, torch.nn.Linear):
+        return "linear"
+    if name in ACTIVATIONS:
+        return "activation"
+    if "Pool" in name:
+        return "pooling"
+    return None
+
+
+class ModuleRanges:
+    """Forward hooks that wrap every submodule's forward in a named profiler range."""
+
+    def __init__(self, model):
+        self.names = {module: name or "<root>" for name, module in model.named_modules()}
+        self.types = {self.names[module]: layer_type(module) for module in self.names}
+        self.classes = {self.names[module]: type(module).__name__ for module in self.names}
+        self.open_ranges = []
+        self.handles = []
+        for module in self.names:
+            self.handles.append(module.register_forward_pre_hook(self._enter))
+            self.handles.append(module.register_forward_hook(self._exit))
+
+    def _enter(self, module, args):
+        scope = record_function(MODULE_PREFIX + self.names[module])
+        scope.__enter__()
+        self.open_ranges.append(scope)
+
+    def _exit(self, module, args, output):
+        self.open_ranges.pop().__exit__(None, None, None)
+
+    def remove(self):
+        for handle in self.handles:
+            handle.remove()
+
+
+def attribute_events(events, ranges):
+    """
+    Attribute profiled CPU time, FLOPs and allocations to modules and layer types.
+    Each op counts towards the innermost module it ran in (self) and every enclosing module (total).
+    For layer types, an op counts towards its outermost composite module (attention, MLP, SE block,
+    embedding) if it has one, otherwise towards its innermost module's own type.
+    :return: (per-module stats keyed by module name, per-type stats keyed by layer type)
+    """
+    modules = defaultdict(lambda: defaultdict(float))
+    types = defaultdict(lambda: defaultdict(float))
+
+    def add(stack, category, key, value):
+        modules[stack[-1]][f"self_{key}"] += value
+        for name in set(stack):
+            modules[name][f"total_{key}"] += value
+        types[category][key] += value
+
+    def visit(event, stack, category, in_flop_op):
+        if event.name.startswith(MODULE_PREFIX):
+            name = event.name[len(MODULE_PREFIX):]
+            own_type = ranges.types.get(name)
+            if category not in COMPOSITE_TYPES:
+                category = own_type or "other"
+            stack = stack + [name]
+            modules[name]["calls"] += 1
+            modules[name]["total_cpu_us"] += event.cpu_time_total
+            # Time spent in the module's Python code between its ops and submodules
+            modules[name]["self_cpu_us"] += event.self_cpu_time_total
+            types[category]["cpu_us"] += event.self_cpu_time_total
+        elif stack:
+            if event.cpu_parent is not None and event.cpu_parent.name.startswith(MODULE_PREFIX):
+                # Outermost op under a module: its total time covers every op it dispatched to
+                modules[stack[-1]]["self_cpu_us"] += event.cpu_time_total
+                types[category]["cpu_us"] += event.cpu_time_total
+            if event.flops and not in_flop_op:
+                # Only the outermost FLOP-counted op, so e.g. matmul and its bmm are not both counted
+                add(stack, category, "flops", event.flops)
+                in_flop_op = True
+            if event.self_cpu_memory_usage > 0:
+                add(stack, category, "alloc_bytes", event.self_cpu_memory_usage)
+        for child in event.cpu_children:
+            visit(child, stack, category, in_flop_op)
+
+    for event in events:
+        if event.cpu_parent is None:
+            visit(event, [], None, False)
+    return modules, types
+
+
+def profile_layers(forward, model, num_runs=10, warmup_runs=3, trace_path=None):
+    """
+    Profile `forward()` with torch.profiler and break its cost down by module and layer type.
+    :param forward: Zero-argument callable running one forward pass of `model`.
+    :param model: Module whose submodules are profiled.
+    :param num_runs: Profiled iterations; every number is reported per iteration.
+    :param warmup_runs: Unprofiled iterations run first.
+    :param trace_path: Optional path for a Chrome trace (chrome://tracing, Perfetto) of the profiled iterations.
+    :return: (per-module rows, per-type rows), each sorted by CPU time.
+    """
+    for _ in range(warmup_runs):
+        forward()
+
+    ranges = ModuleRanges(model)
+    try:
+        with profile(activities=[ProfilerActivity.CPU], record_shapes=True, profile_memory=True,
+                     with_flops=True) as prof:
+            for _ in range(num_runs):
+                forward()
+    finally:
+        ranges.remove()
+    if trace_path:
+        prof.export_chrome_trace(trace_path)
+
+    modules, types = attribute_events(prof.events(), ranges)
+    module_rows = [{
+        "module": name,
+        "class": ranges.classes.get(name, ""),
+        "layer_type": ranges.types.get(name) or "",
+        "calls": int(stats["calls"] / num_runs),
+        "self_cpu_ms": stats["self_cpu_us"] / 1000 / num_runs,
+        "total_cpu_ms": stats["total_cpu_us"] / 1000 / num_runs,
+        "self_flops": stats["self_flops"] / num_runs,
+        "total_flops": stats["total_flops"] / num_runs,
+        "self_alloc_bytes": stats["self_alloc_bytes"] / num_runs,
+        "total_alloc_bytes": stats["total_alloc_bytes"] / num_runs,
+    } for name, stats in modules.items()]
+    module_rows.sort(key=lambda row: row["self_cpu_ms"], reverse=True)
+
+    total_cpu = sum(stats["cpu_us"] for stats in types.values()) or 1.0
+    type_rows = [{
+        "layer_type": category,
+        "cpu_ms": stats["cpu_us"] / 1000 / num_runs,
+        "cpu_share": stats["cpu_us"] / total_cpu,
+        "flops": stats["flops"] / num_runs,
+        "alloc_bytes": stats["alloc_bytes"] / num_runs,
+    } for category, stats in types.items()]
+    type_rows.sort(key=lambda row: row["cpu_ms"], reverse=True)
+    return module_rows, type_rows
+
+
+def write_rows(rows, path):
+    """Write profile rows to a CSV file, columns in row order."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
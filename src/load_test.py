@@ -0,0 +1,202 @@
+import csv
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import aiohttp
+
+from benchmark_models import load_checkpoint_model, load_test_dataset
+from checkpoint_registry import build_index, select_checkpoints
+from models.engine import get_backbone
+from dataset.batch_transforms import BatchResizeNormalize
+from serve_model import Predictor, DynamicBatcher
+from timing import latency_stats
+
+
+class InProcessTarget:
+    """Sends requests straight to a `DynamicBatcher` in this process, without HTTP overhead."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def start(self):
+        await self.batcher.start()
+
+    async def stop(self):
+        await self.batcher.stop()
+
+    async def send(self, image):
+        await self.batcher.submit(image)
+
+
+class HttpTarget:
+    """POSTs raw 32x32 RGB bytes to a running `serve_model.py` endpoint."""
+
+    def __init__(self, url):
+        self.url = url
+        self.session = None
+
+    async def start(self):
+        # No client-side connection cap, so the server (not the client) is what saturates
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+
+    async def stop(self):
+        await self.session.close()
+
+    async def send(self, image):
+        async with self.session.post(self.url, data=image.permute(1, 2, 0).numpy().tobytes()) as response:
+            response.raise_for_status()
+            await response.read()
+
+
+async def timed_send(target, image, start, latencies, errors):
+    try:
+        await target.send(image)
+        latencies.append(time.perf_counter() - start)
+    except Exception:
+        errors.append(1)
+
+
+async def run_open_loop(target, images, rate, duration, seed=0):
+    """
+    Poisson arrivals at `rate` requests/s for `duration` seconds, independent of completions.
+    Latency is measured from each request's scheduled arrival, so a backed-up target is not
+    hidden by the generator slowing down (coordinated omission).
+    :return: (latencies, error count, elapsed seconds, offered rate, achieved rate)
+    """
+    rng = np.random.default_rng(seed)
+    arrivals = np.cumsum(rng.exponential(1 / rate, size=max(1, int(rate * duration))))
+    latencies, errors, tasks = [], [], []
+    begin = time.perf_counter()
+    for i, offset in enumerate(arrivals):
+        delay = begin + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(timed_send(target, images[i % len(images)], begin + offset, latencies, errors)))
+    # Responses completed while requests were still arriving; draining the backlog afterwards
+    # would otherwise let a target that fell behind look like it kept up
+    achieved = len(latencies) / (time.perf_counter() - begin)
+    await asyncio.gather(*tasks)
+    # Realized arrival rate of this Poisson draw, which the achieved rate is checked against
+    offered = len(arrivals) / float(arrivals[-1])
+    return latencies, len(errors), time.perf_counter() - begin, offered, achieved
+
+
+async def run_closed_loop(target, images, concurrency, duration):
+    """`concurrency` workers that each send their next request as soon as the previous one returns."""
+    latencies, errors = [], []
+    begin = time.perf_counter()
+
+    async def worker(offset):
+        i = offset
+        while time.perf_counter() - begin < duration:
+            await timed_send(target, images[i % len(images)], time.perf_counter(), latencies, errors)
+            i += concurrency
+
+    await asyncio.gather(*[worker(offset) for offset in range(concurrency)])
+    return latencies, len(errors), time.perf_counter() - begin
+
+
+def summarize(mode, level, latencies, errors, elapsed, offered=None, achieved=None, slo=0.1):
+    row = {"mode": mode, "level": level, "requests": len(latencies), "errors": errors,
+           "elapsed": elapsed, "throughput": len(latencies) / elapsed}
+    if offered is not None:
+        row["offered_rate"] = offered
+        row["achieved_rate"] = achieved
+    if latencies:
+        stats = latency_stats(latencies)
+        row.update({f"latency_{key}": stats[key] for key in ["mean", "p50", "p90", "p99", "max"]})
+    row["meets_slo"] = bool(latencies) and not errors and row["latency_p99"] <= slo
+    if mode == "open":
+        # A rate is only sustained if the target also kept up with it
+        row["meets_slo"] = row["meets_slo"] and achieved >= 0.9 * offered
+    rate = achieved if mode == "open" else row["throughput"]
+    print(f"{mode}-loop {level:>8}: {rate:8.1f} req/s  "
+          f"p50 {row.get('latency_p50', float('nan')) * 1000:8.2f}ms  p99 {row.get('latency_p99', float('nan')) * 1000:8.2f}ms  "
+          f"errors {errors}  {'OK' if row['meets_slo'] else 'SLO MISSED'}")
+    return row
+
+
+async def run_load_test(target, images, rates, concurrencies, duration, slo):
+    rows = []
+    await target.start()
+    try:
+        # Short warm-up so one-off costs (first batch, compilation) stay out of the measured levels
+        await run_closed_loop(target, images, 4, min(duration, 2.0))
+        for rate in rates:
+            rows.append(summarize("open", rate, *await run_open_loop(target, images, rate, duration), slo=slo))
+        for concurrency in concurrencies:
+            rows.append(summarize("closed", concurrency, *await run_closed_loop(target, images, concurrency, duration),
+                                  slo=slo))
+    finally:
+        await target.stop()
+    return rows
+
+
+def max_sustainable_rate(rows):
+    """Highest open-loop rate whose p99 met the SLO without falling behind."""
+    sustained = [row["level"] for row in rows if row["mode"] == "open" and row["meets_slo"]]
+    return max(sustained) if sustained else None
+
+
+def save_load_test_results(report, json_path="./logs/load_test_results.json", csv_path="./logs/load_test_results.csv"):
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(dict.fromkeys(key for row in report["levels"] for key in row)))
+        writer.writeheader()
+        writer.writerows(report["levels"])
+    print(f"Load test results saved to: {json_path}, {csv_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drive the inference path at fixed rates/concurrency and report SLO compliance.")
+    parser.add_argument("--url", default=None,
+                        help="Predict endpoint of a running serve_model.py; without it the model is served in-process")
+    parser.add_argument("--models-dir", default="./saved_models")
+    parser.add_argument("--model", default="deit_tiny", help="Backbone to load for in-process runs")
+    parser.add_argument("--checkpoint", default=None, help="Explicit checkpoint filename for in-process runs")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="In-process batcher setting (1 disables batching)")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="In-process batcher setting")
+    parser.add_argument("--rates", nargs="+", type=float, default=[10, 25, 50, 100, 200, 400],
+                        help="Open-loop request rates (req/s), Poisson arrivals")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64], help="Closed-loop worker counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per load level")
+    parser.add_argument("--slo-ms", type=float, default=100.0, help="p99 latency objective")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Real test images as the request payloads
+    images = list(next(iter(load_test_dataset(batch_size=64, num_workers=0)))[0])
+
+    if args.url:
+        target, description = HttpTarget(args.url), args.url
+    else:
+        selected = select_checkpoints(build_index(args.models_dir), backbones=[args.model],
+                                      files=[args.checkpoint] if args.checkpoint else None)
+        if not selected:
+            print(f"No matching checkpoints found in {args.models_dir}.")
+            return
+        entry = selected[0]
+        spec = get_backbone(entry["backbone"])
+        mean, std = spec["normalization"]()
+        predictor = Predictor(load_checkpoint_model(entry, "cpu"), BatchResizeNormalize(spec["image_size"], mean, std))
+        target = InProcessTarget(DynamicBatcher(predictor, args.max_batch_size, args.max_wait_ms))
+        description = f"{entry['file']} (in-process, max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms)"
+
+    print(f"Load testing {description}, p99 SLO {args.slo_ms}ms, {args.duration}s per level")
+    rows = asyncio.run(run_load_test(target, images, args.rates, args.concurrency, args.duration, args.slo_ms / 1000))
+
+    best_rate = max_sustainable_rate(rows)
+    print(f"\nMax sustainable rate under p99 <= {args.slo_ms}ms: "
+          f"{f'{best_rate:g} req/s' if best_rate is not None else 'none of the tested rates'}")
+    save_load_test_results({"target": description, "slo_ms": args.slo_ms, "duration": args.duration,
+                            "max_sustainable_rate": best_rate, "levels": rows})
+
+
+if __name__ == "__main__":
+    main()
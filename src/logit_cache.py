@@ -0,0 +1,65 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+from file_store import read_index, invalidate_index, write_index
+
+CACHE_DIR = "./saved_models/logit_cache"
+LOGITS_FILE = "logits.npy"
+LABELS_FILE = "labels.npy"
+
+
+def logit_cache_dir(cache_root, checkpoint, dataset, preprocessing, precision, compiled=False):
+    """
+    Cache directory for one benchmark configuration.
+    :param cache_root: Root directory holding every cached configuration.
+    :param checkpoint: SHA-256 of the checkpoint file.
+    :param dataset: Fingerprint of the evaluation data.
+    :param preprocessing: JSON-serializable input transform config (resolution, normalization).
+    :param precision: Numeric precision of the forward pass.
+    :param compiled: Whether the forward pass was torch.compile'd.
+    :return: (cache directory, key fields)
+    """
+    key = {"checkpoint": checkpoint, "dataset": dataset, "preprocessing": preprocessing,
+           "precision": precision, "compiled": compiled}
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(cache_root, digest), key
+
+
+def read_logit_cache(cache_dir):
+    """Return memory-mapped (logits, labels), or None if the cache is missing or incomplete."""
+    if read_index(cache_dir) is None:
+        return None
+    return (np.load(os.path.join(cache_dir, LOGITS_FILE), mmap_mode="r"),
+            np.load(os.path.join(cache_dir, LABELS_FILE), mmap_mode="r"))
+
+
+class LogitCacheWriter:
+    """Writes a test pass's logits and labels batch by batch into memory-mapped arrays."""
+
+    def __init__(self, cache_dir, num_samples, num_classes, key=None):
+        self.cache_dir = cache_dir
+        self.key = key or {}
+        os.makedirs(cache_dir, exist_ok=True)
+        invalidate_index(cache_dir)
+        self.logits = np.lib.format.open_memmap(os.path.join(cache_dir, LOGITS_FILE), mode="w+",
+                                                dtype=np.float32, shape=(num_samples, num_classes))
+        self.labels = np.lib.format.open_memmap(os.path.join(cache_dir, LABELS_FILE), mode="w+",
+                                                dtype=np.int64, shape=(num_samples,))
+        self.num_written = 0
+
+    def write(self, logits, labels):
+        end = self.num_written + len(labels)
+        self.logits[self.num_written:end] = logits
+        self.labels[self.num_written:end] = labels
+        self.num_written = end
+
+    def finish(self):
+        """Flush the arrays and mark the cache complete if every sample was written."""
+        self.logits.flush()
+        self.labels.flush()
+        complete = self.num_written == len(self.labels)
+        write_index(self.cache_dir, {**self.key, "num_samples": self.num_written, "complete": complete})
+        self.logits = self.labels = None
+        return complete
@@ -0,0 +1,653 @@
+import os
+import sys
+import csv
+import json
+import time
+import copy
+import datetime
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset, Subset
+import torchvision.transforms as transforms
+import pytorch_lightning as pl
+from pytorch_lightning.callbacks import Callback, ModelCheckpoint, LearningRateMonitor
+from pytorch_lightning.loggers import CSVLogger
+from pytorch_lightning.strategies import DDPStrategy
+from pytorch_lightning import seed_everything
+from torchmetrics.classification import (
+    MulticlassPrecision, MulticlassRecall, MulticlassF1Score,
+    MulticlassAveragePrecision, MulticlassConfusionMatrix
+)
+from torchmetrics import MetricCollection
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset.tensor_cache import CachedTensorDataset, get_or_build_cache
+from dataset.batch_transforms import BatchResizeNormalize
+from dataset.cifar10_store import DATA_DIR, PackedCIFAR10, load_split, split_indices
+from precision import lightning_precision
+from logit_cache import read_logit_cache
+from compile_utils import CompiledForward
+
+
+# Backbone factories: each returns a module whose output is logits or a Hugging Face output with `.logits`
+def build_deit_tiny(num_classes):
+    from transformers import AutoModelForImageClassification
+    return AutoModelForImageClassification.from_pretrained(
+        "facebook/deit-tiny-patch16-224",
+        num_labels=num_classes,
+        ignore_mismatched_sizes=True  # Ignore size mismatch in the classifier layer
+    )
+
+
+def build_deit_tiny_distilled(num_classes):
+    from transformers import AutoModelForImageClassification
+    # DeiT-T with both heads: class token (ground truth) and distillation token (teacher)
+    return AutoModelForImageClassification.from_pretrained(
+        "facebook/deit-tiny-distilled-patch16-224",
+        num_labels=num_classes,
+        ignore_mismatched_sizes=True
+    )
+
+
+def build_mobilenet_v3_large(num_classes):
+    from torchvision.models import mobilenet_v3_large, MobileNet_V3_Large_Weights
+    model = mobilenet_v3_large(weights=MobileNet_V3_Large_Weights.DEFAULT)
+    model.classifier[3] = torch.nn.Linear(model.classifier[3].in_features, num_classes)
+    return model
+
+
+def build_mobilenet_v3_small(num_classes):
+    from torchvision.models import mobilenet_v3_small, MobileNet_V3_Small_Weights
+    model = mobilenet_v3_small(weights=MobileNet_V3_Small_Weights.DEFAULT)
+    model.classifier[3] = torch.nn.Linear(model.classifier[3].in_features, num_classes)
+    return model
+
+
+def build_mobilenet_v2(num_classes):
+    from transformers import AutoModelForImageClassification
+    # Already fine-tuned on CIFAR-10, so the head keeps its 10 outputs
+    return AutoModelForImageClassification.from_pretrained("AiresPucrs/Mobilenet-v2-CIFAR-10")
+
+
+def resize_patch_embedding(weight, patch_size):
+    """Area-resample a (D, C, P, P) patch kernel to `patch_size`, keeping its response to locally constant patches."""
+    scale = (weight.shape[-1] / patch_size) ** 2
+    return F.adaptive_avg_pool2d(weight, patch_size) * scale
+
+
+def resize_position_embeddings(embeddings, grid_size):
+    """Bicubically interpolate a ViT position table (1, prefix + G*G, D) to a grid_size x grid_size patch grid."""
+    # Everything before the square patch grid is class/distillation tokens
+    old_size = int(embeddings.shape[1] ** 0.5)
+    num_prefix = embeddings.shape[1] - old_size ** 2
+    prefix, grid = embeddings[:, :num_prefix], embeddings[:, num_prefix:]
+    grid = grid.reshape(1, old_size, old_size, -1).permute(0, 3, 1, 2)
+    grid = F.interpolate(grid, size=(grid_size, grid_size), mode="bicubic", align_corners=False)
+    return torch.cat([prefix, grid.permute(0, 2, 3, 1).reshape(1, grid_size * grid_size, -1)], dim=1)
+
+
+def adapt_vit_resolution(model, image_size=32, patch_size=4):
+    """
+    Rebuild a Hugging Face ViT/DeiT classifier for `image_size` inputs with `patch_size` patches,
+    reusing its weights: the patch kernel is resampled and the position embeddings interpolated.
+    """
+    config = copy.deepcopy(model.config)
+    config.image_size, config.patch_size = image_size, patch_size
+    native = type(model)(config)
+    state_dict = model.state_dict()
+    for key, value in state_dict.items():
+        if key.endswith("patch_embeddings.projection.weight"):
+            state_dict[key] = resize_patch_embedding(value, patch_size)
+        elif key.endswith("embeddings.position_embeddings"):
+            state_dict[key] = resize_position_embeddings(value, image_size // patch_size)
+    native.load_state_dict(state_dict)
+    return native
+
+
+def reduce_strides(model, num_layers=2):
+    """
+    Set the first `num_layers` stride-2 convolutions to stride 1, in place; weights are unchanged.
+    For 32x32 inputs this keeps a 4x4 final feature map instead of collapsing it to 1x1.
+    """
+    strided = [module for module in model.modules()
+               if isinstance(module, torch.nn.Conv2d) and module.stride == (2, 2)]
+    for module in strided[:num_layers]:
+        module.stride = (1, 1)
+    return model
+
+
+def default_normalization():
+    return (0.5, 0.5, 0.5), (0.5, 0.5, 0.5)
+
+
+def imagenet_normalization():
+    return (0.485, 0.456, 0.406), (0.229, 0.224, 0.225)
+
+
+def mobilenet_v2_normalization():
+    # Use preprocessing as per the pretrained model's requirements
+    from transformers import AutoImageProcessor
+    processor = AutoImageProcessor.from_pretrained("AiresPucrs/Mobilenet-v2-CIFAR-10")
+    return tuple(processor.image_mean), tuple(processor.image_std)
+
+
+# Model registry: `name` is the prefix used for checkpoints and logs, `display_name` is used in reports
+BACKBONES = {
+    "deit_tiny": {
+        "name": "DeiTTinyForClassification",
+        "display_name": "DeiT-T",
+        "build": build_deit_tiny,
+        "image_size": 224,
+        "normalization": default_normalization,
+    },
+    "deit_tiny_distilled": {
+        "name": "DeiTTinyDistilled",
+        "display_name": "DeiT-T (distilled)",
+        "build": build_deit_tiny_distilled,
+        "image_size": 224,
+        "normalization": imagenet_normalization,
+    },
+    "mobilenet_v3_large": {
+        "name": "MobileNetV3L",
+        "display_name": "MobileNetV3-L",
+        "build": build_mobilenet_v3_large,
+        "image_size": 32,
+        "normalization": default_normalization,
+    },
+    "mobilenet_v3_small": {
+        "name": "MobileNetV3S",
+        "display_name": "MobileNetV3-S",
+        "build": build_mobilenet_v3_small,
+        "image_size": 32,
+        "normalization": default_normalization,
+    },
+    "mobilenet_v2": {
+        "name": "MobileNetV2CIFAR10",
+        "display_name": "MobileNetV2",
+        "build": build_mobilenet_v2,
+        "image_size": 224,
+        "normalization": mobilenet_v2_normalization,
+    },
+}
+
+
+# Native-resolution (32x32) variants: each derives from a base backbone (`base`) through `adapt`, so it
+# can start from the same pretrained weights or from a trained checkpoint of that backbone. The DeiT
+# variants drop the base's 224px upsample and use 4x4 patches. MobileNetV3-L/S already take 32px input,
+# so their variants only reduce strides; MobileNetV2's base upsamples to 224px, so its variant both
+# drops the upsample and reduces strides.
+NATIVE_VARIANTS = {
+    "deit_tiny": ("DeiTTinyNative32", lambda model: adapt_vit_resolution(model, image_size=32, patch_size=4)),
+    "deit_tiny_distilled": ("DeiTTinyDistilledNative32", lambda model: adapt_vit_resolution(model, image_size=32, patch_size=4)),
+    "mobilenet_v3_large": ("MobileNetV3LNative32", reduce_strides),
+    "mobilenet_v3_small": ("MobileNetV3SNative32", reduce_strides),
+    "mobilenet_v2": ("MobileNetV2Native32", reduce_strides),
+}
+for _base, (_name, _adapt) in NATIVE_VARIANTS.items():
+    BACKBONES[f"{_base}_native32"] = {
+        **BACKBONES[_base],
+        "name": _name,
+        "display_name": f"{BACKBONES[_base]['display_name']} (native 32px)",
+        "build": lambda num_classes, base=_base, adapt=_adapt: adapt(BACKBONES[base]["build"](num_classes)),
+        "image_size": 32,
+        "base": _base,
+        "adapt": _adapt,
+    }
+
+
+def get_backbone(backbone):
+    if backbone not in BACKBONES:
+        raise ValueError(f"Unknown backbone '{backbone}', expected one of {list(BACKBONES)}")
+    return BACKBONES[backbone]
+
+
+def load_backbone_weights(backbone, num_classes, checkpoint_path):
+    """
+    Build `backbone` from a trained Lightning checkpoint. A checkpoint of the base backbone a
+    native variant derives from is loaded into that backbone first and then adapted.
+    """
+    checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+    source = checkpoint.get("hyper_parameters", {}).get("backbone", backbone)
+    spec = get_backbone(backbone)
+    if source != backbone and spec.get("base") != source:
+        raise ValueError(f"Checkpoint of '{source}' cannot initialize '{backbone}'")
+    model = get_backbone(source)["build"](num_classes)
+    model.load_state_dict({key[len("model."):]: value for key, value in checkpoint["state_dict"].items()
+                           if key.startswith("model.")})
+    return spec["adapt"](model) if source != backbone else model
+
+
+DISTILLATION_TYPES = ("hard", "soft")
+
+
+def distillation_loss(student_logits, teacher_logits, distillation_type="hard", temperature=1.0):
+    """
+    DeiT distillation objective against precomputed teacher logits.
+    :param distillation_type: "hard" (cross-entropy on the teacher's argmax) or "soft" (temperature-scaled KL).
+    """
+    if distillation_type == "hard":
+        return F.cross_entropy(student_logits, teacher_logits.argmax(dim=1))
+    return F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1), F.log_softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean", log_target=True,
+    ) * temperature ** 2
+
+
+class WithTeacherLogits(Dataset):
+    """Appends the teacher's precomputed logits to every sample; `logits` is row-aligned with `dataset`."""
+
+    def __init__(self, dataset, logits):
+        self.dataset = dataset
+        self.logits = logits
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        image, label = self.dataset[idx]
+        return image, label, torch.from_numpy(np.array(self.logits[idx], dtype=np.float32))
+
+
+class ClassificationModule(pl.LightningModule):
+    def __init__(self, backbone, num_classes=10, learning_rate=0.001, batch_transform=None, grad_norm_interval=10,
+                 compile=False, compile_mode="default", init_checkpoint=None, distillation=None, init_model=None):
+        super().__init__()
+        self.save_hyperparameters(ignore=["batch_transform", "init_model"])
+        self.learning_rate = learning_rate
+
+        if init_model is not None:
+            # Already-built backbone whose architecture differs from the registry's (e.g. pruned)
+            self.model = init_model
+        elif init_checkpoint:
+            self.model = load_backbone_weights(backbone, num_classes, init_checkpoint)
+        else:
+            self.model = get_backbone(backbone)["build"](num_classes)
+
+        # Optional torch.compile'd forward; checkpoints still hold the plain backbone weights
+        self.compiled_forward = CompiledForward(self.model, mode=compile_mode) if compile else None
+
+        # Cross-entropy loss for classification
+        self.criterion = torch.nn.CrossEntropyLoss()
+
+        # Optional distillation settings: alpha (teacher weight), type ("hard"/"soft") and temperature
+        self.distillation = distillation
+
+        # Metrics: steps only update() state on device, values are computed once per epoch.
+        # Argument validation is off, since its checks (unique targets, range tests) sync with the host every step
+        self.train_metrics = MetricCollection({
+            "precision": MulticlassPrecision(num_classes=num_classes, average="macro", validate_args=False),
+            "recall": MulticlassRecall(num_classes=num_classes, average="macro", validate_args=False),
+            "f1": MulticlassF1Score(num_classes=num_classes, average="macro", validate_args=False),
+            # Binned AP: a fixed-size state instead of every sample's scores
+            "map": MulticlassAveragePrecision(num_classes=num_classes, thresholds=100, validate_args=False),
+        }, prefix="train_")
+        self.val_metrics = MetricCollection({
+            "precision": MulticlassPrecision(num_classes=num_classes, average="macro", validate_args=False),
+            "recall": MulticlassRecall(num_classes=num_classes, average="macro", validate_args=False),
+            "f1": MulticlassF1Score(num_classes=num_classes, average="macro", validate_args=False),
+        }, prefix="val_")
+        # val_map and the per-class logs are derived from these at epoch end
+        self.val_class_ap = MulticlassAveragePrecision(num_classes=num_classes, average=None, validate_args=False)
+        self.confusion_matrix = MulticlassConfusionMatrix(num_classes=num_classes, validate_args=False)
+
+        # Optional on-device resize/normalize for raw uint8 batches
+        self.batch_transform = batch_transform
+
+        # Gradient norms, averaged over the sampled steps of each epoch. Sum and count stay on device
+        # and the mean is only computed when the epoch is logged.
+        self.grad_norm_interval = grad_norm_interval
+        self.register_buffer("grad_norm_sum", torch.zeros(()), persistent=False)
+        self.register_buffer("grad_norm_count", torch.zeros(()), persistent=False)
+
+    def model_outputs(self, x):
+        return self.compiled_forward(x) if self.compiled_forward is not None else self.model(x)
+
+    def forward(self, x):
+        outputs = self.model_outputs(x)
+        return getattr(outputs, "logits", outputs)  # Hugging Face models wrap logits in a ModelOutput
+
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        if self.batch_transform is None:
+            return batch
+        x, *targets = batch
+        # Match the module's dtype, since Lightning casts inputs for bf16-true before this hook runs
+        return self.batch_transform(x).to(self.dtype), *targets
+
+    def training_step(self, batch, batch_idx):
+        x, y, *teacher = batch
+        outputs = self.model_outputs(x)
+        logits = getattr(outputs, "logits", outputs)
+        if self.distillation and teacher:
+            # Students with a distillation token learn the labels through the class head and the
+            # teacher through the distillation head; others blend both targets on their one head
+            alpha = self.distillation["alpha"]
+            class_logits = getattr(outputs, "cls_logits", logits)
+            student_logits = getattr(outputs, "distillation_logits", logits)
+            distill = distillation_loss(student_logits, teacher[0], self.distillation["type"],
+                                        self.distillation["temperature"])
+            loss = (1 - alpha) * self.criterion(class_logits, y) + alpha * distill
+            self.log("distillation_loss", distill, on_step=False, on_epoch=True, sync_dist=True)
+        else:
+            loss = self.criterion(logits, y)
+
+        # Accumulate metric state; Lightning computes and resets it at epoch end
+        self.train_metrics.update(logits.detach(), y)
+        self.log("train_loss", loss, on_step=False, on_epoch=True, sync_dist=True)
+        self.log_dict(self.train_metrics, on_step=False, on_epoch=True)
+
+        return loss
+
+    def validation_step(self, batch, batch_idx):
+        x, y = batch[:2]
+        logits = self.forward(x)
+        loss = self.criterion(logits, y)
+
+        self.val_metrics.update(logits, y)
+        self.val_class_ap.update(logits, y)
+        self.confusion_matrix.update(logits, y)
+        self.log("val_loss", loss, on_step=False, on_epoch=True, sync_dist=True)
+        self.log_dict(self.val_metrics, on_step=False, on_epoch=True)
+
+        return loss
+
+    def on_validation_epoch_end(self):
+        # Metric.compute() gathers state from every rank, so these values are already global
+        # Ensure AP is iterable and handle NaN values
+        ap = torch.nan_to_num(self.val_class_ap.compute(), nan=0.0)
+        if ap.dim() == 0:
+            ap = ap.unsqueeze(0)
+
+        # Derive FP/FN from the epoch's confusion matrix
+        confusion_matrix = self.confusion_matrix.compute()
+        true_positives = confusion_matrix.diag()
+        false_positives = (confusion_matrix.sum(dim=0) - true_positives).float()
+        false_negatives = (confusion_matrix.sum(dim=1) - true_positives).float()
+        self.val_class_ap.reset()
+        self.confusion_matrix.reset()
+
+        self.log("val_map", ap.mean())
+        per_class = {}
+        for i in range(len(ap)):
+            per_class[f"class_{i}_fp"] = false_positives[i]
+            per_class[f"class_{i}_fn"] = false_negatives[i]
+            per_class[f"class_{i}_ap"] = ap[i]
+        self.log_dict(per_class)
+
+    def on_after_backward(self):
+        # Sample the global gradient norm every `grad_norm_interval` steps
+        if not self.grad_norm_interval or self.global_step % self.grad_norm_interval:
+            return
+        grads = [p.grad for p in self.parameters() if p.grad is not None]
+        if not grads:
+            return
+        # One fused kernel over all gradients; the result only feeds device-side accumulators
+        total_norm = torch.linalg.vector_norm(torch.stack(torch._foreach_norm(grads, 2.0)), 2.0).detach()
+        self.grad_norm_sum += total_norm.float()
+        self.grad_norm_count += 1
+        self.log("grad_norm", total_norm, on_step=True, on_epoch=False)
+
+    def log_grad_norm_average(self):
+        """Log the epoch's mean sampled gradient norm and reset the accumulators; a no-op once logged."""
+        if not self.grad_norm_count:
+            return
+        self.log("avg_grad_norm", self.grad_norm_sum / self.grad_norm_count, sync_dist=True)
+        self.grad_norm_sum.zero_()
+        self.grad_norm_count.zero_()
+
+    def on_train_epoch_end(self):
+        self.log_grad_norm_average()
+
+    def configure_optimizers(self):
+        optimizer = torch.optim.Adam(self.parameters(), lr=self.learning_rate)
+        scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=10, gamma=0.1)
+        return [optimizer], [scheduler]
+
+
+class StepTimer(Callback):
+    """
+    Wall time of every training step, so steady-state speed can be reported apart from compile/warmup.
+    Steps are timed from the end of one batch to the end of the next, so dataloader fetch and collate
+    time (which competes with the compute for the same cores) is included.
+    """
+
+    def __init__(self):
+        self.step_times = []
+        self._last = None
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        self._last = time.perf_counter()
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+        now = time.perf_counter()
+        self.step_times.append(now - self._last)
+        self._last = now
+
+    def steady_step_time(self):
+        # Median is robust to the few steps that pay for (re)compilation
+        return float(np.median(self.step_times)) if self.step_times else 0.0
+
+
+class EpochMetricsCSV(Callback):
+    """Appends one row of epoch-level metrics per training epoch to a standalone CSV."""
+
+    COLUMNS = ['epoch', 'train_loss', 'train_precision', 'train_recall', 'train_f1', 'train_map',
+               'val_loss', 'val_precision', 'val_recall', 'val_f1', 'val_map',
+               'grad_norm', 'avg_grad_norm', 'learning_rate']
+
+    def __init__(self, path):
+        self.path = path
+
+    def setup(self, trainer, pl_module, stage):
+        # Metrics are already reduced across ranks, so only rank 0 writes
+        if trainer.is_global_zero:
+            with open(self.path, mode='w', newline='') as file:
+                csv.writer(file).writerow(self.COLUMNS)
+
+    def on_train_epoch_end(self, trainer, pl_module):
+        # Callback hooks run before the module's, so the gradient-norm mean is logged here (on every rank)
+        if hasattr(pl_module, "log_grad_norm_average"):
+            pl_module.log_grad_norm_average()
+        if not trainer.is_global_zero:
+            return
+        metrics = trainer.callback_metrics
+        row = [trainer.current_epoch]
+        for column in self.COLUMNS[1:]:
+            key = 'lr-Adam' if column == 'learning_rate' else column
+            value = metrics.get(key, 0)
+            row.append(value.item() if torch.is_tensor(value) else value)
+        with open(self.path, mode='a', newline='') as file:
+            csv.writer(file).writerow(row)
+
+
+class ProcessPinning(Callback):
+    """Pins each training process to its own slice of the available cores, with a matching thread count."""
+
+    def __init__(self, threads_per_process=None):
+        self.threads_per_process = threads_per_process
+        self.cores = None
+
+    def setup(self, trainer, pl_module, stage):
+        available = sorted(os.sched_getaffinity(0))
+        per_process = max(1, len(available) // trainer.world_size)
+        start = (trainer.global_rank * per_process) % len(available)
+        self.cores = available[start:start + per_process]
+        # Dataloader workers are started later, so they inherit this affinity
+        os.sched_setaffinity(0, self.cores)
+        torch.set_num_threads(self.threads_per_process or len(self.cores))
+
+
+# Prepare CIFAR-10 dataset
+def prepare_data(backbone, data_dir=DATA_DIR, cache_dir=None, raw=False, val_fraction=0.2, teacher_logits=None):
+    spec = get_backbone(backbone)
+    image_size = spec["image_size"]
+    mean, std = spec["normalization"]()
+
+    if raw:
+        # Ship uint8 32x32 tensors; the model resizes/normalizes the whole batch on-device
+        dataset = PackedCIFAR10("train", data_dir)
+    elif cache_dir:
+        # Resize/normalize once into a memory-mapped cache instead of every epoch
+        images, labels = load_split("train", data_dir)
+        dataset = CachedTensorDataset(get_or_build_cache(
+            images.transpose(0, 2, 3, 1), labels, cache_dir, "cifar10_train",
+            image_size=image_size, mean=mean, std=std, source=data_dir
+        ))
+    else:
+        transform = [transforms.ToTensor(), transforms.Normalize(mean, std)]
+        if image_size != 32:
+            transform.insert(0, transforms.Resize((image_size, image_size)))
+        dataset = PackedCIFAR10("train", data_dir, transform=transforms.Compose(transform))
+    if teacher_logits is not None:
+        dataset = WithTeacherLogits(dataset, teacher_logits)
+    train_indices, val_indices = split_indices(data_dir, val_fraction)
+    return Subset(dataset, train_indices.tolist()), Subset(dataset, val_indices.tolist())
+
+
+def main(backbone):
+    if os.getenv("NATIVE_RESOLUTION", "0") == "1" and not backbone.endswith("_native32"):
+        backbone = f"{backbone}_native32"
+    spec = get_backbone(backbone)
+    model_name = spec["name"]
+
+    # Setup directories
+    saved_models_dir = os.getenv("SAVED_MODELS_DIR", "saved_models")
+    logs_dir = "logs"
+    os.makedirs(saved_models_dir, exist_ok=True)
+    os.makedirs(logs_dir, exist_ok=True)
+
+    # Read training parameters from environment variables, or use default values
+    epochs = int(os.getenv("EPOCHS", 10))
+    learning_rate = float(os.getenv("LEARNING_RATE", 0.001))
+    batch_size = int(os.getenv("BATCH_SIZE", 32))
+    batch_transforms = os.getenv("BATCH_TRANSFORMS", "0") == "1"
+    grad_norm_interval = int(os.getenv("GRAD_NORM_INTERVAL", 10))
+    precision = lightning_precision(os.getenv("PRECISION", "fp32"))
+    compile_model = os.getenv("COMPILE", "0") == "1"
+    compile_mode = os.getenv("COMPILE_MODE", "default")
+    num_processes = int(os.getenv("NUM_PROCESSES", 1))
+    threads_per_process = int(os.getenv("THREADS_PER_PROCESS", 0)) or None
+    max_steps = int(os.getenv("MAX_STEPS", -1))
+    teacher_checkpoint = os.getenv("DISTILL_TEACHER")
+    distillation = None
+    if teacher_checkpoint:
+        distillation = {
+            "alpha": float(os.getenv("DISTILL_ALPHA", 0.5)),
+            "type": os.getenv("DISTILL_TYPE", "hard"),
+            "temperature": float(os.getenv("DISTILL_TEMPERATURE", 1.0)),
+        }
+        if distillation["type"] not in DISTILLATION_TYPES:
+            raise ValueError(f"Unknown DISTILL_TYPE '{distillation['type']}', expected one of {list(DISTILLATION_TYPES)}")
+
+    # Seed everything for reproducibility
+    seed_everything(42, workers=True)
+
+    # Teacher logits over the train split are computed once and cached on disk. This runs before
+    # DDP ranks are launched; the relaunched ranks take the finished cache from the environment
+    # instead of resolving the teacher checkpoint again.
+    teacher_logits = None
+    if teacher_checkpoint:
+        if "DISTILL_TEACHER_LOGITS" not in os.environ:
+            from distillation import precompute_teacher_logits
+            os.environ["DISTILL_TEACHER_LOGITS"] = precompute_teacher_logits(teacher_checkpoint)
+        teacher_logits = read_logit_cache(os.environ["DISTILL_TEACHER_LOGITS"])[0]
+
+    # Dataset and DataLoader
+    train_dataset, val_dataset = prepare_data(backbone, cache_dir=os.getenv("TENSOR_CACHE"), raw=batch_transforms,
+                                              teacher_logits=teacher_logits)
+    train_loader = DataLoader(
+        train_dataset,
+        batch_size=batch_size,
+        shuffle=True,
+        num_workers=4,
+        persistent_workers=True
+    )
+    val_loader = DataLoader(
+        val_dataset,
+        batch_size=batch_size,
+        num_workers=4,
+        persistent_workers=True
+    )
+
+    # Initialize model
+    batch_transform = None
+    if batch_transforms:
+        mean, std = spec["normalization"]()
+        batch_transform = BatchResizeNormalize(spec["image_size"], mean, std)
+    model = ClassificationModule(backbone, num_classes=10, learning_rate=learning_rate,
+                                 batch_transform=batch_transform, grad_norm_interval=grad_norm_interval,
+                                 compile=compile_model, compile_mode=compile_mode,
+                                 init_checkpoint=os.getenv("INIT_CHECKPOINT"), distillation=distillation)
+
+    # Callbacks
+    # DDP ranks are relaunched copies of this script, so they take the run timestamp from
+    # the environment to agree on checkpoint and log names
+    current_time = os.environ.setdefault("RUN_TIMESTAMP", datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+    checkpoint_callback = ModelCheckpoint(
+        monitor="val_map",
+        mode="max",
+        dirpath=saved_models_dir,
+        filename=f"{model_name}_{current_time}_best",
+        save_top_k=1
+    )
+    checkpoint_callback_epoch = ModelCheckpoint(
+        every_n_epochs=1,
+        dirpath=saved_models_dir,
+        filename=f"{model_name}_{current_time}_epoch{{epoch}}"
+    )
+    lr_monitor = LearningRateMonitor(logging_interval="epoch")
+    step_timer = StepTimer()
+    metrics_csv = EpochMetricsCSV(os.path.join(logs_dir, f"metrics_{current_time}.csv"))
+    csv_logger = CSVLogger(logs_dir, name=f"{model_name}_{current_time}")
+    callbacks = [checkpoint_callback, checkpoint_callback_epoch, lr_monitor, metrics_csv, step_timer]
+
+    # Data-parallel CPU training: one gloo DDP process per core slice, each with a 1/N shard of the data
+    accelerator = "gpu" if torch.cuda.is_available() else "cpu"
+    strategy = "auto"
+    if num_processes > 1 and accelerator == "cpu":
+        strategy = DDPStrategy(process_group_backend="gloo")
+        callbacks.append(ProcessPinning(threads_per_process))
+
+    # Trainer
+    start_time = time.time()
+    trainer = pl.Trainer(
+        max_epochs=epochs,
+        max_steps=max_steps,
+        callbacks=callbacks,
+        logger=csv_logger,
+        log_every_n_steps=10,
+        accelerator=accelerator,
+        devices=num_processes if strategy != "auto" else 1,
+        strategy=strategy,
+        precision=precision
+    )
+    trainer.fit(model, train_loader, val_loader)
+    training_time = time.time() - start_time
+
+    # Log training time, keeping compilation separate from steady-state step time
+    steady_step_time = step_timer.steady_step_time()
+    timings = {
+        "training_time": training_time,
+        "steady_step_time": steady_step_time,
+        "num_processes": trainer.world_size,
+        # Every rank steps in lockstep on its own batch, so the global rate scales with the world size
+        "images_per_second": trainer.world_size * batch_size / steady_step_time if steady_step_time else 0.0,
+    }
+    if model.compiled_forward is not None:
+        timings.update(model.compiled_forward.summary())
+    if not trainer.is_global_zero:
+        return
+    csv_logger.log_hyperparams(timings)
+    if os.getenv("RUN_SUMMARY"):
+        with open(os.getenv("RUN_SUMMARY"), "w") as f:
+            json.dump(timings, f, indent=2)
+    print(f"Training completed in {training_time:.2f} seconds")
+    print(f"Steady-state step time: {timings['steady_step_time'] * 1000:.1f} ms "
+          f"({timings['images_per_second']:.1f} images/s over {timings['num_processes']} process(es))")
+    if model.compiled_forward is not None:
+        print(f"Compile time: {timings['compile_time']:.2f} seconds over {timings['compilations']} compilation(s), "
+              f"{timings['graph_breaks']} graph break(s)" + (" (fell back to eager)" if timings["compile_fallback"] else ""))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getenv("BACKBONE", "deit_tiny"))
@@ -0,0 +1,76 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import tempfile
+import subprocess
+
+
+def run_training(backbone, num_processes, max_steps, threads_per_process=None):
+    """
+    Run a short training job with `num_processes` DDP ranks in a fresh interpreter.
+    Checkpoints go to a scratch directory so they do not show up among the real ones.
+    :return: The run's timing summary.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        summary_path = os.path.join(scratch, "summary.json")
+        env = dict(os.environ, NUM_PROCESSES=str(num_processes), EPOCHS="1", MAX_STEPS=str(max_steps),
+                   RUN_SUMMARY=summary_path, SAVED_MODELS_DIR=os.path.join(scratch, "saved_models"))
+        env.pop("RUN_TIMESTAMP", None)
+        if threads_per_process:
+            env["THREADS_PER_PROCESS"] = str(threads_per_process)
+        engine = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.py")
+        subprocess.run([sys.executable, engine, backbone], env=env, check=True)
+        with open(summary_path) as f:
+            return json.load(f)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Training throughput vs number of DDP CPU processes.")
+    parser.add_argument("backbone", nargs="?", default="mobilenet_v3_small")
+    parser.add_argument("--processes", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--max-steps", type=int, default=50, help="Optimizer steps per run")
+    parser.add_argument("--threads-per-process", type=int, default=None,
+                        help="Intra-op threads per rank (default: the size of its core slice)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs("logs", exist_ok=True)
+
+    rows = []
+    for num_processes in args.processes:
+        print(f"\nTraining {args.backbone} with {num_processes} process(es)...")
+        summary = run_training(args.backbone, num_processes, args.max_steps, args.threads_per_process)
+        rows.append({
+            "num_processes": num_processes,
+            "images_per_second": summary["images_per_second"],
+            "steady_step_time": summary["steady_step_time"],
+            "training_time": summary["training_time"],
+        })
+
+    # Speedup and parallel efficiency relative to the first (smallest) process count
+    base = rows[0]
+    for row in rows:
+        row["speedup"] = row["images_per_second"] / base["images_per_second"]
+        row["efficiency"] = row["speedup"] * base["num_processes"] / row["num_processes"]
+
+    print(f"\n{'processes':>9} {'images/s':>10} {'step (ms)':>10} {'speedup':>8} {'efficiency':>10}")
+    for row in rows:
+        print(f"{row['num_processes']:>9} {row['images_per_second']:>10.1f} {row['steady_step_time'] * 1000:>10.1f} "
+              f"{row['speedup']:>7.2f}x {row['efficiency']:>10.0%}")
+
+    json_path, csv_path = "logs/ddp_scaling.json", "logs/ddp_scaling.csv"
+    with open(json_path, "w") as f:
+        json.dump({"backbone": args.backbone, "max_steps": args.max_steps, "runs": rows}, f, indent=2)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Scaling report saved to: {json_path}, {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
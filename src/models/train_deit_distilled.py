@@ -0,0 +1,9 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from models.engine import main
+
+
+if __name__ == "__main__":
+    main("deit_tiny_distilled")
@@ -0,0 +1,37 @@
+import contextlib
+import torch
+
+# Friendly names accepted on the command line / environment -> Lightning precision strings
+PRECISIONS = {
+    "fp32": "32-true",
+    "32-true": "32-true",
+    "bf16-mixed": "bf16-mixed",
+    "bf16-true": "bf16-true",
+}
+
+
+def lightning_precision(precision):
+    """Normalize a precision name to the value `pl.Trainer(precision=...)` expects."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+    return PRECISIONS[precision]
+
+
+def autocast_context(precision, device):
+    """bf16 autocast for mixed precision; a no-op context otherwise."""
+    if lightning_precision(precision) == "bf16-mixed":
+        return torch.autocast(device_type=str(device).split(":")[0], dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def cast_model(model, precision):
+    """Convert weights for true-bf16 inference; fp32 and mixed precision keep fp32 weights."""
+    if lightning_precision(precision) == "bf16-true":
+        return model.to(torch.bfloat16)
+    return model
+
+
+def cast_input(x, precision):
+    if lightning_precision(precision) == "bf16-true":
+        return x.to(torch.bfloat16)
+    return x
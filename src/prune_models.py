@@ -0,0 +1,302 @@
+import os
+import copy
+import argparse
+import torch
+from torch.utils.data import DataLoader
+from pytorch_lightning import Trainer
+from pytorch_lightning.loggers import CSVLogger
+from torchvision.models.mobilenetv3 import InvertedResidual
+from transformers.pytorch_utils import prune_linear_layer
+
+from benchmark_models import (
+    BenchmarkModel, load_checkpoint_model, load_test_dataset, benchmark_label, compare_to_reference, save_results
+)
+from checkpoint_registry import build_index, select_checkpoints
+from timing import measure_latency
+from models.engine import BACKBONES, ClassificationModule, get_backbone, prepare_data
+from dataset.batch_transforms import BatchResizeNormalize
+
+# Structured pruning scheme per backbone: whole channels, heads and neurons are removed, so the
+# result is a smaller dense model rather than a sparse one
+PRUNING_SCHEMES = {
+    "deit_tiny": "transformer",
+    "deit_tiny_distilled": "transformer",
+    "mobilenet_v3_large": "channels",
+    "mobilenet_v3_small": "channels",
+}
+# Native-resolution variants keep their base backbone's architecture, so they share its scheme
+PRUNABLE_BACKBONES = [key for key, spec in BACKBONES.items() if spec.get("base", key) in PRUNING_SCHEMES]
+
+
+def keep_count(size, keep_ratio, multiple=1):
+    """Number of units to keep, rounded to `multiple` (SIMD-friendly widths) and never below one multiple."""
+    return min(size, max(multiple, int(round(size * keep_ratio / multiple)) * multiple))
+
+
+def top_indices(scores, count):
+    """Indices of the `count` highest scores, in their original order."""
+    return torch.sort(torch.topk(scores, count).indices).values
+
+
+def prune_conv(conv, out_keep=None, in_keep=None):
+    """Copy of a Conv2d restricted to the kept output/input channels; depthwise convs keep their grouping."""
+    depthwise = conv.groups > 1 and conv.groups == conv.in_channels == conv.out_channels
+    weight, bias = conv.weight.data, conv.bias.data if conv.bias is not None else None
+    if out_keep is not None:
+        weight = weight[out_keep]
+        bias = bias[out_keep] if bias is not None else None
+    if in_keep is not None and not depthwise:
+        weight = weight[:, in_keep]
+    out_channels = weight.shape[0]
+    in_channels = out_channels if depthwise else weight.shape[1] * conv.groups
+    pruned = torch.nn.Conv2d(in_channels, out_channels, conv.kernel_size, stride=conv.stride, padding=conv.padding,
+                             dilation=conv.dilation, groups=out_channels if depthwise else conv.groups,
+                             bias=bias is not None)
+    pruned.weight.data = weight.clone()
+    if bias is not None:
+        pruned.bias.data = bias.clone()
+    return pruned
+
+
+def prune_batch_norm(bn, keep):
+    pruned = torch.nn.BatchNorm2d(len(keep), eps=bn.eps, momentum=bn.momentum)
+    for name in ("weight", "bias", "running_mean", "running_var"):
+        getattr(pruned, name).data = getattr(bn, name).data[keep].clone()
+    return pruned
+
+
+def prune_inverted_residual(block, keep_ratio):
+    """
+    Remove expansion channels of a MobileNetV3 block, ranked by the |gamma| of the expansion BatchNorm.
+    The block's input and output widths are untouched, so residual connections still line up.
+    Blocks without an expansion layer are left alone.
+    """
+    layers = list(block.block)
+    expand, depthwise = layers[0], layers[1]
+    if expand[0].groups != 1:
+        return
+    keep = top_indices(expand[1].weight.data.abs(), keep_count(expand[0].out_channels, keep_ratio, multiple=8))
+    expand[0], expand[1] = prune_conv(expand[0], out_keep=keep), prune_batch_norm(expand[1], keep)
+    depthwise[0], depthwise[1] = prune_conv(depthwise[0], out_keep=keep), prune_batch_norm(depthwise[1], keep)
+    for layer in layers[2:-1]:
+        # Squeeze-and-excitation: its squeeze input and excitation output follow the expansion width
+        layer.fc1 = prune_conv(layer.fc1, in_keep=keep)
+        layer.fc2 = prune_conv(layer.fc2, out_keep=keep)
+    project = layers[-1]
+    project[0] = prune_conv(project[0], in_keep=keep)
+
+
+def prune_channels(model, keep_ratio):
+    """Channel pruning of a torchvision MobileNetV3: every expansion layer plus the classifier's hidden layer."""
+    for module in model.modules():
+        if isinstance(module, InvertedResidual):
+            prune_inverted_residual(module, keep_ratio)
+    hidden, output = model.classifier[0], model.classifier[3]
+    keep = top_indices(hidden.weight.data.norm(dim=1), keep_count(hidden.out_features, keep_ratio, multiple=8))
+    model.classifier[0] = prune_linear_layer(hidden, keep, dim=0)
+    model.classifier[3] = prune_linear_layer(output, keep, dim=1)
+    return model
+
+
+def prune_transformer(model, keep_ratio):
+    """
+    Attention-head and MLP-width pruning of a Hugging Face DeiT.
+    Heads are ranked by the norm of their slice of the attention output projection; MLP neurons
+    by the product of their input and output weight norms.
+    """
+    heads_to_prune = {}
+    for i, layer in enumerate(model.base_model.encoder.layer):
+        attention = layer.attention.attention
+        num_heads, head_size = attention.num_attention_heads, attention.attention_head_size
+        head_scores = layer.attention.output.dense.weight.data.view(-1, num_heads, head_size).norm(dim=(0, 2))
+        keep = set(top_indices(head_scores, keep_count(num_heads, keep_ratio)).tolist())
+        heads_to_prune[i] = [head for head in range(num_heads) if head not in keep]
+
+        intermediate, output = layer.intermediate.dense, layer.output.dense
+        neuron_scores = intermediate.weight.data.norm(dim=1) * output.weight.data.norm(dim=0)
+        keep = top_indices(neuron_scores, keep_count(intermediate.out_features, keep_ratio, multiple=8))
+        layer.intermediate.dense = prune_linear_layer(intermediate, keep, dim=0)
+        layer.output.dense = prune_linear_layer(output, keep, dim=1)
+    model.prune_heads(heads_to_prune)
+    return model
+
+
+def prune_model(model, backbone, keep_ratio):
+    """
+    Structurally prune a copy of a `LogitsModel`.
+    :param keep_ratio: Fraction of channels / heads / MLP neurons to keep in every prunable layer.
+    """
+    scheme = PRUNING_SCHEMES.get(get_backbone(backbone).get("base", backbone))
+    if scheme is None:
+        raise ValueError(f"No structured pruning scheme for backbone '{backbone}'")
+    pruned = copy.deepcopy(model)
+    prune = prune_channels if scheme == "channels" else prune_transformer
+    pruned.model = prune(pruned.model, keep_ratio)
+    return pruned.eval()
+
+
+def measure_cpu_latency(model, image_size, num_runs=50, warmup_runs=10):
+    """Median batch-1 CPU latency of the forward pass, on the same input shape `benchmark_speed` uses."""
+    dummy_input = torch.randn(1, 3, image_size, image_size)
+    model.eval()
+
+    def forward():
+        with torch.inference_mode():
+            model(dummy_input)
+
+    stats, _ = measure_latency(forward, "cpu", num_runs=num_runs, warmup_runs=warmup_runs)
+    return stats["p50"]
+
+
+def prune_to_latency(model, backbone, image_size, target_latency, min_keep_ratio=0.25, search_steps=6):
+    """
+    Binary search for the largest keep ratio whose pruned model meets `target_latency` (seconds).
+    Latency is measured rather than estimated from parameter counts, since FLOPs and parameters
+    track CPU time poorly (memory-bound depthwise convs, attention overhead).
+    :return: (pruned model, keep ratio, its measured latency); the smallest model if the target is unreachable.
+    """
+    low, high = min_keep_ratio, 1.0
+    best = None
+    for _ in range(search_steps):
+        keep_ratio = (low + high) / 2
+        pruned = prune_model(model, backbone, keep_ratio)
+        latency = measure_cpu_latency(pruned, image_size)
+        print(f"keep ratio {keep_ratio:.3f}: {latency * 1000:.2f} ms")
+        if latency <= target_latency:
+            best = (pruned, keep_ratio, latency)
+            low = keep_ratio
+        else:
+            high = keep_ratio
+    if best is None:
+        pruned = prune_model(model, backbone, min_keep_ratio)
+        best = (pruned, min_keep_ratio, measure_cpu_latency(pruned, image_size))
+        print(f"Target latency not reached; using the minimum keep ratio {min_keep_ratio:.3f}")
+    return best
+
+
+def fine_tune(model, backbone, epochs=1, max_steps=-1, learning_rate=1e-4, batch_size=32):
+    """Recover accuracy of a pruned `LogitsModel` in place with the training engine's module and data split."""
+    spec = get_backbone(backbone)
+    mean, std = spec["normalization"]()
+    train_dataset, val_dataset = prepare_data(backbone, raw=True)
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=4, persistent_workers=True)
+    val_loader = DataLoader(val_dataset, batch_size=batch_size, num_workers=4, persistent_workers=True)
+    module = ClassificationModule(backbone, num_classes=10, learning_rate=learning_rate, init_model=model.model,
+                                  batch_transform=BatchResizeNormalize(spec["image_size"], mean, std))
+    trainer = Trainer(
+        max_epochs=epochs,
+        max_steps=max_steps,
+        logger=CSVLogger("logs", name="pruning_logs"),
+        enable_checkpointing=False,
+        log_every_n_steps=10,
+        accelerator="gpu" if torch.cuda.is_available() else "cpu",
+        devices=1,
+    )
+    trainer.fit(module, train_loader, val_loader)
+    model.model = module.model.cpu()
+    return model.eval()
+
+
+def parameter_count(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Structured pruning of trained checkpoints to a target CPU latency.")
+    parser.add_argument("--models-dir", default="./saved_models")
+    parser.add_argument("--models", nargs="+", default=PRUNABLE_BACKBONES,
+                        help="Backbones to prune (MobileNetV3-L/S, DeiT-T and their native variants)")
+    parser.add_argument("--checkpoints", nargs="+", default=None, help="Explicit checkpoint filenames")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--target-latency-ms", type=float, default=None, help="Batch-1 CPU latency to prune down to")
+    target.add_argument("--target-speedup", type=float, default=1.5,
+                        help="Prune until latency is the unpruned latency divided by this factor")
+    parser.add_argument("--min-keep-ratio", type=float, default=0.25,
+                        help="Smallest fraction of channels / heads / MLP neurons kept per layer")
+    parser.add_argument("--search-steps", type=int, default=6)
+    parser.add_argument("--finetune-epochs", type=int, default=1, help="Fine-tuning epochs after pruning (0 skips it)")
+    parser.add_argument("--finetune-steps", type=int, default=-1, help="Cap on fine-tuning optimizer steps")
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for latency measurements")
+    parser.add_argument("--output-dir", default="./saved_models/pruned")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    # Targets are CPU latencies, so pruning and benchmarking both run on the CPU
+    device = "cpu"
+
+    selected = select_checkpoints(build_index(args.models_dir), backbones=args.models, files=args.checkpoints)
+    selected = [entry for entry in selected
+                if get_backbone(entry["backbone"]).get("base", entry["backbone"]) in PRUNING_SCHEMES]
+    if not selected:
+        print(f"No matching checkpoints found in {args.models_dir}.")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    test_loader = load_test_dataset()
+    logger = CSVLogger(save_dir="./logs", name="pruning_logs")
+    trainer = Trainer(logger=logger, accelerator=device, devices=1, max_epochs=1, inference_mode=True)
+
+    benchmarks = []
+    for entry in selected:
+        label = benchmark_label(entry, selected)
+        spec = get_backbone(entry["backbone"])
+        mean, std = spec["normalization"]()
+        input_transform = BatchResizeNormalize(spec["image_size"], mean, std)
+        model = load_checkpoint_model(entry, device).eval()
+
+        baseline_latency = measure_cpu_latency(model, spec["image_size"])
+        target_latency = (args.target_latency_ms / 1000 if args.target_latency_ms is not None
+                          else baseline_latency / args.target_speedup)
+        print(f"\nPruning {label} ({entry['file']}): {baseline_latency * 1000:.2f} ms -> "
+              f"target {target_latency * 1000:.2f} ms")
+        pruned, keep_ratio, pruned_latency = prune_to_latency(model, entry["backbone"], spec["image_size"],
+                                                              target_latency, args.min_keep_ratio, args.search_steps)
+        if args.finetune_epochs > 0:
+            print(f"\nFine-tuning pruned {label}...")
+            pruned = fine_tune(pruned, entry["backbone"], epochs=args.finetune_epochs, max_steps=args.finetune_steps,
+                               learning_rate=args.learning_rate, batch_size=args.batch_size)
+
+        # Unpruned reference first, then the pruned model through the same benchmark
+        reference = None
+        for variant, variant_model in [("unpruned", model), (f"pruned {keep_ratio:.2f}", pruned)]:
+            run_label = f"{label} [{variant}]"
+            print(f"\nBenchmarking {run_label}...")
+            benchmark = BenchmarkModel(variant_model, test_loader, run_label, input_transform=input_transform,
+                                       image_size=spec["image_size"])
+            trainer.test(benchmark, test_loader)
+            benchmark.benchmark_speed(device)
+            benchmark.measure_model_size()
+            benchmark.results["checkpoint"] = entry["file"]
+            benchmark.results["parameters"] = parameter_count(variant_model)
+
+            if reference is None:
+                reference = benchmark.results
+            else:
+                compare_to_reference(benchmark.results, reference)
+                benchmark.results["pruning"] = (
+                    f"keep ratio {keep_ratio:.3f}, {reference['parameters']:,} -> "
+                    f"{benchmark.results['parameters']:,} parameters, p50 latency "
+                    f"{baseline_latency * 1000:.2f} -> {pruned_latency * 1000:.2f} ms "
+                    f"(target {target_latency * 1000:.2f} ms), "
+                    + (f"fine-tuned {args.finetune_epochs} epoch(s)" if args.finetune_epochs > 0 else "not fine-tuned")
+                )
+                stem = os.path.splitext(entry["file"])[0]
+                output_path = os.path.join(args.output_dir, f"{stem}_pruned{int(round(keep_ratio * 100))}.pt")
+                torch.save(variant_model, output_path)
+                benchmark.results["pruned_path"] = output_path
+                print(f"Saved pruned model to: {output_path}")
+
+            benchmark.model = None
+            benchmarks.append(benchmark)
+
+    save_results(benchmarks, "./logs/pruning_results.txt")
+
+
+if __name__ == "__main__":
+    main()
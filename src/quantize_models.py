@@ -0,0 +1,149 @@
+import os
+import copy
+import argparse
+import warnings
+import torch
+from torch.utils.data import DataLoader, Subset
+from torch.ao.quantization import quantize_dynamic, get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from pytorch_lightning import Trainer
+from pytorch_lightning.loggers import CSVLogger
+
+from benchmark_models import (
+    BenchmarkModel, load_checkpoint_model, load_test_dataset, benchmark_label, compare_to_reference, save_results
+)
+from checkpoint_registry import build_index, select_checkpoints
+from models.engine import get_backbone
+from dataset.batch_transforms import BatchResizeNormalize
+from dataset.cifar10_store import DATA_DIR, PackedCIFAR10, split_indices
+
+# Default scheme per backbone: Linear-heavy transformers get dynamic quantization,
+# conv nets get static FX quantization with calibrated activation ranges
+DEFAULT_MODES = {
+    "deit_tiny": "dynamic",
+    "deit_tiny_distilled": "dynamic",
+    "mobilenet_v3_large": "static",
+    "mobilenet_v3_small": "static",
+    "mobilenet_v2": "static",
+}
+
+
+def load_calibration_data(num_samples=512, batch_size=32, data_dir=DATA_DIR, seed=0):
+    """Random slice of the training images (validation images excluded), as raw uint8 batches."""
+    train_indices, _ = split_indices(data_dir)
+    generator = torch.Generator().manual_seed(seed)
+    indices = train_indices[torch.randperm(len(train_indices), generator=generator)[:num_samples].numpy()]
+    return DataLoader(Subset(PackedCIFAR10("train", data_dir), indices.tolist()), batch_size=batch_size, shuffle=False)
+
+
+def quantize_dynamic_int8(model):
+    """Dynamic INT8 quantization of every Linear layer; activations are quantized on the fly."""
+    return quantize_dynamic(copy.deepcopy(model).eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_int8(model, calibration_loader, input_transform):
+    """Static INT8 quantization via FX graph mode, calibrated on `calibration_loader`."""
+    model = copy.deepcopy(model).eval()
+    example_images, _ = next(iter(calibration_loader))
+    example_inputs = (input_transform(example_images),)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(torch.backends.quantized.engine), example_inputs)
+    with torch.inference_mode():
+        for images, _ in calibration_loader:
+            prepared(input_transform(images))
+    return convert_fx(prepared)
+
+
+def quantize_model(model, mode, calibration_loader, input_transform):
+    """
+    Quantize a fp32 model with the requested scheme.
+    :return: (quantized model, scheme actually used)
+    """
+    if mode == "static":
+        try:
+            return quantize_static_int8(model, calibration_loader, input_transform), "static"
+        except Exception as e:
+            # Models FX cannot trace (e.g. data-dependent control flow) still get the Linear layers quantized
+            warnings.warn(f"Static FX quantization failed, falling back to dynamic: {e}")
+    return quantize_dynamic_int8(model), "dynamic"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Post-training INT8 quantization of trained checkpoints.")
+    parser.add_argument("--models-dir", default="./saved_models")
+    parser.add_argument("--models", nargs="+", default=None, help="Backbones to quantize (default: all)")
+    parser.add_argument("--checkpoints", nargs="+", default=None, help="Explicit checkpoint filenames")
+    parser.add_argument("--mode", choices=["auto", "dynamic", "static"], default="auto",
+                        help="Quantization scheme (auto: dynamic for DeiT-T, static for the MobileNets)")
+    parser.add_argument("--calibration-samples", type=int, default=512)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                        help="Largest accuracy loss vs fp32 for a quantized model to be accepted and saved")
+    parser.add_argument("--output-dir", default="./saved_models/quantized")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Quantized kernels are CPU-only
+    device = "cpu"
+
+    selected = select_checkpoints(build_index(args.models_dir), backbones=args.models, files=args.checkpoints)
+    if not selected:
+        print(f"No matching checkpoints found in {args.models_dir}.")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    test_loader = load_test_dataset()
+    calibration_loader = load_calibration_data(num_samples=args.calibration_samples)
+    logger = CSVLogger(save_dir="./logs", name="quantization_logs")
+    trainer = Trainer(logger=logger, accelerator=device, devices=1, max_epochs=1, inference_mode=True)
+
+    benchmarks = []
+    for entry in selected:
+        label = benchmark_label(entry, selected)
+        spec = get_backbone(entry["backbone"])
+        mean, std = spec["normalization"]()
+        input_transform = BatchResizeNormalize(spec["image_size"], mean, std)
+        model = load_checkpoint_model(entry, device).eval()
+
+        # fp32 reference first, then the quantized variant through the same benchmark
+        # Native-resolution variants use the same scheme as the backbone they derive from
+        mode = DEFAULT_MODES[spec.get("base", entry["backbone"])] if args.mode == "auto" else args.mode
+        print(f"\nQuantizing {label} ({entry['file']}, {mode})...")
+        quantized, used_mode = quantize_model(model, mode, calibration_loader, input_transform)
+
+        reference = None
+        for variant, variant_model in [("fp32", model), (f"{used_mode}-int8", quantized)]:
+            run_label = f"{label} [{variant}]"
+            print(f"\nBenchmarking {run_label}...")
+            benchmark = BenchmarkModel(variant_model, test_loader, run_label, input_transform=input_transform,
+                                       image_size=spec["image_size"])
+            trainer.test(benchmark, test_loader)
+            benchmark.benchmark_speed(device)
+            benchmark.measure_model_size()
+            benchmark.results["checkpoint"] = entry["file"]
+            benchmark.results["quantization"] = variant
+
+            if reference is None:
+                reference = benchmark.results
+            else:
+                compare_to_reference(benchmark.results, reference)
+                passed = -benchmark.results["accuracy_delta"] <= args.max_accuracy_drop
+                benchmark.results["quantization_gate"] = (
+                    f"{'PASSED' if passed else 'FAILED'} (max accuracy drop {args.max_accuracy_drop:.4f})"
+                )
+                print(f"Accuracy gate: {benchmark.results['quantization_gate']}")
+                if passed:
+                    stem = os.path.splitext(entry["file"])[0]
+                    output_path = os.path.join(args.output_dir, f"{stem}_{used_mode}_int8.pt")
+                    torch.save(variant_model, output_path)
+                    benchmark.results["quantized_path"] = output_path
+                    print(f"Saved quantized model to: {output_path}")
+
+            benchmark.model = None
+            benchmarks.append(benchmark)
+
+    save_results(benchmarks, "./logs/quantization_results.txt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import io
+import time
+import asyncio
+import argparse
+import bisect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from PIL import Image
+from aiohttp import web
+
+from benchmark_models import load_checkpoint_model
+from checkpoint_registry import build_index, select_checkpoints
+from models.engine import get_backbone
+from dataset.batch_transforms import BatchResizeNormalize
+from dataset.cifar10_store import CLASS_NAMES
+from compile_utils import CompiledForward
+from precision import PRECISIONS, autocast_context, cast_model, cast_input
+from timing import latency_stats
+
+# Upper bucket edges in milliseconds for the per-request latency histogram
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class Histogram:
+    """Fixed-bucket histogram; the last bucket collects everything above the largest edge."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return dict(zip(labels, self.counts))
+
+
+class ServingStats:
+    """Per-request latency and per-batch size accounting, with percentiles over a recent window."""
+
+    def __init__(self, max_batch_size, window=10000):
+        self.latency_histogram = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_size_counts = [0] * (max_batch_size + 1)
+        self.recent_latencies = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def record_request(self, latency):
+        self.requests += 1
+        self.recent_latencies.append(latency)
+        self.latency_histogram.observe(latency * 1000)
+
+    def record_batch(self, batch_size):
+        self.batches += 1
+        self.batch_size_counts[batch_size] += 1
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        stats = {
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "uptime": elapsed,
+            "throughput": self.requests / elapsed if elapsed > 0 else 0.0,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "latency_ms_histogram": self.latency_histogram.to_dict(),
+            "batch_size_histogram": {size: count for size, count in enumerate(self.batch_size_counts) if count},
+        }
+        if self.recent_latencies:
+            stats["latency"] = latency_stats(list(self.recent_latencies))
+        return stats
+
+
+class Predictor:
+    """Checkpoint model plus its input transform; maps a raw uint8 NCHW batch to class probabilities."""
+
+    def __init__(self, model, input_transform, precision="fp32", compile=False):
+        self.precision = precision
+        self.model = cast_model(model.eval(), precision)
+        self.input_transform = input_transform
+        self.forward = CompiledForward(self.model) if compile else self.model
+
+    def __call__(self, images):
+        with torch.inference_mode():
+            x = self.input_transform(images)
+            with autocast_context(self.precision, x.device):
+                logits = self.forward(cast_input(x, self.precision)).float()
+            return torch.softmax(logits, dim=1)
+
+
+class DynamicBatcher:
+    """
+    Groups concurrent single-image requests into micro-batches.
+
+    A batch is dispatched once it holds `max_batch_size` images or `max_wait_ms` after its first
+    request arrived, whichever comes first. The model runs on a single worker thread, so the event
+    loop keeps accepting requests (and forming the next batch) while the current one is computed.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = ServingStats(max_batch_size)
+        self.queue = None
+        self.executor = None
+        self.task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, image):
+        """
+        Queue one image and wait for its result.
+        :param image: uint8 tensor of shape (3, H, W).
+        :return: (class probabilities, size of the batch it ran in)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        first = await self.queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                # Past the deadline, still take whatever is already queued
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout) if timeout > 0 else self.queue.get_nowait())
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            try:
+                probs = await loop.run_in_executor(self.executor, self.predict_fn, torch.stack([item[0] for item in batch]))
+            except Exception as e:
+                self.stats.errors += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            self.stats.record_batch(len(batch))
+            for i, (_, future, enqueued) in enumerate(batch):
+                self.stats.record_request(finished - enqueued)
+                if not future.done():
+                    future.set_result((probs[i], len(batch)))
+
+
+def decode_image(body, input_size=32):
+    """
+    Decode a request body into a uint8 (3, input_size, input_size) tensor.
+    Accepts any format PIL can open, or raw HWC RGB bytes of an input_size x input_size image.
+    """
+    if len(body) == input_size * input_size * 3:
+        array = np.frombuffer(body, dtype=np.uint8).reshape(input_size, input_size, 3)
+    else:
+        image = Image.open(io.BytesIO(body)).convert("RGB")
+        if image.size != (input_size, input_size):
+            image = image.resize((input_size, input_size), Image.BILINEAR)
+        array = np.asarray(image)
+    return torch.from_numpy(array.copy()).permute(2, 0, 1)
+
+
+def create_app(batcher, model_info, input_size=32):
+    routes = web.RouteTableDef()
+
+    @routes.post("/predict")
+    async def predict(request):
+        start = time.perf_counter()
+        try:
+            image = decode_image(await request.read(), input_size)
+        except Exception as e:
+            raise web.HTTPBadRequest(text=f"Could not decode image: {e}")
+        probs, batch_size = await batcher.submit(image)
+        prediction = int(probs.argmax())
+        return web.json_response({
+            "prediction": prediction,
+            "label": CLASS_NAMES[prediction],
+            "probabilities": probs.tolist(),
+            "batch_size": batch_size,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        })
+
+    @routes.get("/metrics")
+    async def metrics(request):
+        return web.json_response(batcher.stats.to_dict())
+
+    @routes.get("/health")
+    async def health(request):
+        return web.json_response({"status": "ok", **model_info})
+
+    app = web.Application(client_max_size=16 * 2 ** 20)
+    app.add_routes(routes)
+
+    async def lifecycle(app):
+        await batcher.start()
+        yield
+        await batcher.stop()
+
+    app.cleanup_ctx.append(lifecycle)
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve a trained checkpoint over HTTP with dynamic batching.")
+    parser.add_argument("--models-dir", default="./saved_models")
+    parser.add_argument("--model", default="deit_tiny", help="Backbone to serve (newest best checkpoint)")
+    parser.add_argument("--checkpoint", default=None, help="Explicit checkpoint filename; overrides --model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Longest a request waits for others to share its batch")
+    parser.add_argument("--precision", default="fp32", choices=list(PRECISIONS))
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for the model")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    selected = select_checkpoints(build_index(args.models_dir), backbones=[args.model],
+                                  files=[args.checkpoint] if args.checkpoint else None)
+    if not selected:
+        print(f"No matching checkpoints found in {args.models_dir}.")
+        return
+    entry = selected[0]
+
+    # Loaded once; every request shares this model
+    spec = get_backbone(entry["backbone"])
+    mean, std = spec["normalization"]()
+    predictor = Predictor(load_checkpoint_model(entry, "cpu"), BatchResizeNormalize(spec["image_size"], mean, std),
+                          precision=args.precision, compile=args.compile)
+    batcher = DynamicBatcher(predictor, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    model_info = {"checkpoint": entry["file"], "backbone": entry["backbone"], "precision": args.precision,
+                  "max_batch_size": args.max_batch_size, "max_wait_ms": args.max_wait_ms}
+
+    print(f"Serving {entry['file']} on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms)")
+    web.run_app(create_app(batcher, model_info), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
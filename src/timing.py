@@ -0,0 +1,54 @@
+import time
+import numpy as np
+import torch
+
+
+def synchronize(device):
+    """Wait for queued kernels so host-side timestamps cover the actual work."""
+    if str(device).startswith("cuda"):
+        torch.cuda.synchronize(device)
+
+
+def latency_stats(samples):
+    """
+    Summarize per-iteration latencies.
+    :param samples: Latencies in seconds.
+    :return: Dict with mean, std, min, p50, p90, p99, max (seconds) and coefficient of variation.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    mean = float(samples.mean())
+    std = float(samples.std(ddof=1)) if len(samples) > 1 else 0.0
+    p50, p90, p99 = (float(p) for p in np.percentile(samples, [50, 90, 99]))
+    return {
+        "mean": mean,
+        "std": std,
+        "min": float(samples.min()),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+        "max": float(samples.max()),
+        "cv": std / mean if mean > 0 else 0.0,
+        "runs": len(samples),
+    }
+
+
+def measure_latency(fn, device, num_runs=100, warmup_runs=10):
+    """
+    Time `fn()` once per iteration with perf_counter_ns, synchronizing the device around each call.
+    :param fn: Zero-argument callable to time (e.g. a forward pass on a fixed input).
+    :param device: Device the work runs on.
+    :param num_runs: Number of timed iterations.
+    :param warmup_runs: Untimed iterations run first (allocator, caches, lazy init).
+    :return: (stats dict from `latency_stats`, raw per-iteration latencies in seconds)
+    """
+    for _ in range(warmup_runs):
+        fn()
+    synchronize(device)
+
+    samples = np.empty(num_runs, dtype=np.float64)
+    for i in range(num_runs):
+        start = time.perf_counter_ns()
+        fn()
+        synchronize(device)
+        samples[i] = (time.perf_counter_ns() - start) * 1e-9
+    return latency_stats(samples), samples
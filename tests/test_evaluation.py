@@ -0,0 +1,23 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from evaluation import average_precision, StreamingClassificationMetrics
+
+
+def test_exact_map_without_bins():
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=(500, 10)).round(1)  # Rounded so tied scores occur
+    labels = rng.integers(0, 10, size=500)
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    expected = np.mean(average_precision(probs / probs.sum(axis=1, keepdims=True), labels, 10))
+
+    exact = StreamingClassificationMetrics(10, num_bins=None)
+    binned = StreamingClassificationMetrics(10, num_bins=10000)
+    for start in range(0, 500, 128):
+        exact.update(logits[start:start + 128], labels[start:start + 128])
+        binned.update(logits[start:start + 128], labels[start:start + 128])
+    assert exact.compute()["mAP"] == expected
+    assert abs(binned.compute()["mAP"] - expected) < 1e-2
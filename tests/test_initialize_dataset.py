@@ -0,0 +1,125 @@
+import io
+import os
+import sys
+import pickle
+import tarfile
+import hashlib
+import threading
+import pathlib
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from dataset.cifar10_store import BATCH_SLOTS, load_split
+from dataset.initialize_dataset import fetch, initialize_cifar10
+
+IMAGES_PER_BATCH = 4
+
+
+def make_batch(seed):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 256, size=(IMAGES_PER_BATCH, 3072), dtype=np.uint8)
+    labels = rng.integers(0, 10, size=IMAGES_PER_BATCH).tolist()
+    return {b"data": data, b"labels": labels}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Small CIFAR-10-format tarball (a few images per batch) and the batches it contains."""
+    batches = {name: make_batch(seed) for seed, name in enumerate(BATCH_SLOTS)}
+    path = tmp_path / "cifar-10-python.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        for name, batch in batches.items():
+            payload = pickle.dumps(batch)
+            info = tarfile.TarInfo(f"cifar-10-batches-py/{name}")
+            info.size = len(payload)
+            tar.addfile(info, io.BytesIO(payload))
+    return path, hashlib.md5(path.read_bytes()).hexdigest(), batches
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Serves one file with Range support, answering 416 for ranges past its end."""
+
+    def do_GET(self):
+        data = pathlib.Path(self.server.file_path).read_bytes()
+        start = int(self.headers.get("Range", "bytes=0-")[len("bytes="):].rstrip("-") or 0)
+        if start and start >= len(data):
+            self.send_response(416)
+            self.end_headers()
+            return
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_url(archive):
+    server = HTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.file_path = archive[0]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/cifar-10-python.tar.gz"
+    server.shutdown()
+
+
+def test_fetch_resumes_interrupted_download(archive, tmp_path):
+    path, md5, _ = archive
+    out = tmp_path / "download.tar.gz"
+    data = path.read_bytes()
+    (tmp_path / "download.tar.gz.part").write_bytes(data[:len(data) // 2])
+
+    fetch(path.as_uri(), str(out), md5=md5, chunk_size=64)
+    assert out.read_bytes() == data
+    assert not (tmp_path / "download.tar.gz.part").exists()
+
+
+def test_fetch_resumes_over_http(archive, http_url, tmp_path):
+    path, md5, _ = archive
+    out = tmp_path / "download.tar.gz"
+    data = path.read_bytes()
+    (tmp_path / "download.tar.gz.part").write_bytes(data[:100])
+
+    fetch(http_url, str(out), md5=md5)
+    assert out.read_bytes() == data
+
+
+def test_fetch_verifies_complete_part_file(archive, http_url, tmp_path):
+    # A previous run downloaded everything but died before the rename; the server answers 416
+    path, md5, _ = archive
+    out = tmp_path / "download.tar.gz"
+    (tmp_path / "download.tar.gz.part").write_bytes(path.read_bytes())
+
+    fetch(http_url, str(out), md5=md5)
+    assert out.read_bytes() == path.read_bytes()
+
+
+def test_fetch_rejects_checksum_mismatch(archive, tmp_path):
+    path, _, _ = archive
+    out = tmp_path / "download.tar.gz"
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        fetch(path.as_uri(), str(out), md5="0" * 32)
+    assert not out.exists()
+    assert not (tmp_path / "download.tar.gz.part").exists()
+
+
+def test_initialize_packs_archive(archive, tmp_path):
+    path, md5, batches = archive
+    data_dir = str(tmp_path / "cifar10")
+    index = initialize_cifar10(data_dir, url=path.as_uri(), md5=md5)
+    assert index["complete"]
+
+    for split in ("train", "test"):
+        images, labels = load_split(split, data_dir)
+        for name, (batch_split, offset) in BATCH_SLOTS.items():
+            if batch_split != split:
+                continue
+            rows = slice(offset, offset + IMAGES_PER_BATCH)
+            expected = batches[name]
+            np.testing.assert_array_equal(images[rows], expected[b"data"].reshape(-1, 3, 32, 32))
+            np.testing.assert_array_equal(labels[rows], expected[b"labels"])
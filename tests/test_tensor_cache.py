@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from dataset.tensor_cache import CachedTensorDataset, get_or_build_cache
+
+IMAGENET_MEAN, IMAGENET_STD = (0.485, 0.456, 0.406), (0.229, 0.224, 0.225)
+
+
+@pytest.mark.parametrize("storage", ["uint8", "float32"])
+def test_cache_per_normalization(tmp_path, storage):
+    images = np.full((4, 8, 8, 3), 255, dtype=np.uint8)
+    labels = list(range(4))
+    half_dir = get_or_build_cache(images, labels, str(tmp_path), "train", image_size=8, storage=storage)
+    imagenet_dir = get_or_build_cache(images, labels, str(tmp_path), "train", image_size=8, storage=storage,
+                                      mean=IMAGENET_MEAN, std=IMAGENET_STD)
+    assert half_dir != imagenet_dir
+
+    half, _ = CachedTensorDataset(half_dir)[0]
+    imagenet, _ = CachedTensorDataset(imagenet_dir)[0]
+    np.testing.assert_allclose(half[:, 0, 0].numpy(), [1.0, 1.0, 1.0], rtol=1e-5)
+    expected = (1.0 - np.array(IMAGENET_MEAN)) / np.array(IMAGENET_STD)
+    np.testing.assert_allclose(imagenet[:, 0, 0].numpy(), expected, rtol=1e-5)